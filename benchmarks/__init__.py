@@ -0,0 +1,5 @@
+"""
+Offline benchmark suite for PromoSensei.
+
+Run from the repo root:  python -m benchmarks.bench
+"""
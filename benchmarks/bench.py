@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+bench.py
+
+End-to-end offline benchmarks.  Everything runs against local data:
+
+* scrape – the registered sources against the recorded fixtures (fixture_server),
+           one at a time, all together on one engine, and a no-change delta run
+* load   – JSON vs Arrow snapshot load time of the offer corpus
+* ingest – embed + upsert docs/sec into a scratch Chroma DB
+* cold   – LiveRAG start-up time against the ingested DB
+* query  – uncached answer latency p50/p95/p99 with per-stage means
+* cache  – hit rate and hit/miss latency for a skewed replay of questions
+
+Scales: master_offers.json as-is (1×) and synthetic 10× / 100× copies with
+unique links.  Results are printed and saved as JSON under results/.
+
+    python -m benchmarks.bench --scales 1 10 --skip scrape
+"""
+import os
+
+# Models must come from the local HF cache; never hit the network
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from metrics import metrics
+from offers import MASTER_FILE, OfferBatch
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+RESULTS_DIR    = Path(__file__).parent / "results"
+PHASES         = ("scrape", "load", "ingest", "cold", "query", "cache")
+DEFAULT_SCALES = (1, 10, 100)
+QUERIES = [
+    "flat 50% off deals today",
+    "best discounts on eye pencils",
+    "PUMA running tops on offer",
+    "Kay Beauty lipstick offers",
+    "cheapest Nykaa kajal",
+    "motorsport jackets sale",
+    "sunscreen discounts",
+    "extra 15% off at checkout",
+    "oversized tees under 1000",
+    "nail polish combo offers",
+    "foundation deals",
+    "what are today's top promotions?",
+]
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {}
+    arr = np.asarray(samples, dtype=float)
+    return {
+        "n":    len(arr),
+        "mean": float(arr.mean()),
+        "p50":  float(np.percentile(arr, 50)),
+        "p95":  float(np.percentile(arr, 95)),
+        "p99":  float(np.percentile(arr, 99)),
+        "max":  float(arr.max()),
+    }
+
+
+def stage_means() -> dict:
+    """Mean seconds per histogram series currently in the metrics registry."""
+    out = {}
+    for name, series in metrics.to_dict()["histograms"].items():
+        for s in series:
+            label = ",".join(f"{k}={v}" for k, v in sorted(s["labels"].items()))
+            out[f"{name}{{{label}}}" if label else name] = s["mean"]
+    return out
+
+
+def counter_value(counters: dict, name: str, **labels) -> float:
+    """Sum of the `name` series in `metrics.to_dict()["counters"]` matching `labels`."""
+    return sum(
+        s["value"] for s in counters.get(name, [])
+        if all(s["labels"].get(k) == v for k, v in labels.items())
+    )
+
+
+def scale_batch(batch: OfferBatch, factor: int) -> OfferBatch:
+    """`factor` copies of `batch`; copies after the first get unique links."""
+    if factor == 1:
+        return batch
+    copies = [batch.table]
+    for i in range(1, factor):
+        link = pc.binary_join_element_wise(batch.table.column("link"), pa.scalar(f"#bench-{i}"), "")
+        copies.append(batch.table.set_column(batch.table.schema.get_field_index("link"), "link", link))
+    return OfferBatch(pa.concat_tables(copies))
+
+
+# ─── Phases ────────────────────────────────────────────────────────────────────
+def fixture_sources(srv) -> list:
+    """The registered sources with their URLs pointed at the fixture server."""
+    from sources import get_source
+
+    nykaa, flipkart, puma = get_source("nykaa"), get_source("flipkart"), get_source("puma")
+    return [
+        replace(nykaa, strategy=replace(nykaa.strategy, base_url=srv.nykaa_api_url)),
+        replace(flipkart, strategy=replace(flipkart.strategy, url=srv.flipkart_url)),
+        replace(puma, strategy=replace(puma.strategy, url=srv.puma_url)),
+    ]
+
+
+def bench_scrape() -> dict:
+    from benchmarks.fixture_server import FixtureServer
+    from sources import FetchState, ScrapeEngine
+
+    async def run(sources, state):
+        async with ScrapeEngine(state) as engine:
+            return await engine.run(sources)
+
+    def timed(sources, state=None) -> dict:
+        # run_source catches a failing source and counts it instead of raising,
+        # so per-site results come from the counters of this run alone
+        metrics.reset()
+        start = time.perf_counter()
+        changed = asyncio.run(run(sources, state))
+        secs    = time.perf_counter() - start
+        counts  = metrics.to_dict()["counters"]
+        sites   = {
+            s.site: {
+                "scraped": counter_value(counts, "items_scraped_total", site=s.site),
+                "changed": counter_value(counts, "items_changed_total", site=s.site),
+                "errors":  counter_value(counts, "scrape_errors_total", site=s.site),
+            }
+            for s in sources
+        }
+        scraped = sum(v["scraped"] for v in sites.values())
+        result  = {"scraped": scraped, "changed": len(changed), "seconds": secs,
+                   "items_per_sec": scraped / secs, "sites": sites}
+        failed  = sorted(site for site, v in sites.items() if v["errors"])
+        if failed:  # e.g. no Chromium installed for Playwright
+            result["errored"] = failed
+        return result
+
+    results = {}
+    with FixtureServer() as srv:
+        sources = fixture_sources(srv)
+        for source in sources:
+            results[source.site] = timed([source])
+        # all sources concurrently on one engine, as scrapper.py runs them, then
+        # again with the state of that run: every page is unchanged (304)
+        state = FetchState()
+        results["all"]       = timed(sources, state)
+        results["all_delta"] = timed(sources, state)
+    return results
+
+
+def write_corpus(batch: OfferBatch, workdir: Path):
+    batch.to_json(workdir / "offers.json")
+    batch.to_snapshot(workdir / "offers.arrow")
+
+
+def bench_load(workdir: Path, repeats: int = 5) -> dict:
+    json_path, snap_path = workdir / "offers.json", workdir / "offers.arrow"
+
+    def best_of(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    return {
+        "json_bytes":       json_path.stat().st_size,
+        "snapshot_bytes":   snap_path.stat().st_size,
+        "json_seconds":     best_of(lambda: OfferBatch.from_json(json_path)),
+        "snapshot_seconds": best_of(lambda: OfferBatch.from_snapshot(snap_path)),
+        "link_column_seconds": best_of(lambda: OfferBatch.from_snapshot(snap_path, columns=["link"])),
+    }
+
+
+def bench_ingest(batch: OfferBatch, db_dir: Path) -> dict:
+    import ingest_to_vector_db as ingest
+
+    from shards import open_client
+
+    metrics.reset()
+    offers = batch.with_link().dedup()
+    start  = time.perf_counter()
+    counts = ingest.ingest_sharded(open_client(db_dir), offers, db_path=db_dir)
+    secs   = time.perf_counter() - start
+    n      = sum(counts.values())
+    return {"docs": n, "shards": counts, "seconds": secs, "docs_per_sec": n / secs, "stages": stage_means()}
+
+
+def bench_cold_start(workdir: Path, db_dir: Path):
+    from rag_query import LiveRAG
+
+    start = time.perf_counter()
+    rag   = LiveRAG(offers_path=workdir / "offers.json", snapshot_path=workdir / "offers.arrow", db_dir=db_dir,
+                    delta_path=workdir / "changed_offers.json")
+    return rag, {"seconds": time.perf_counter() - start, "indexed": len(rag.seen_ids), "shards": len(rag.shards)}
+
+
+def bench_query(rag, rounds: int) -> dict:
+    metrics.reset()
+    latencies = []
+    for _ in range(rounds):
+        for q in QUERIES:
+            rag.clear_answer_cache()
+            start = time.perf_counter()
+            rag.answer(q)
+            latencies.append(time.perf_counter() - start)
+    return {"latency": percentiles(latencies), "stages": stage_means()}
+
+
+def bench_cache(rag, requests: int, seed: int = 0) -> dict:
+    """Replay a Zipf-skewed mix of QUERIES through the answer cache."""
+    metrics.reset()
+    rag.clear_answer_cache()
+    rng     = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(len(QUERIES))]
+    hits, misses = [], []
+    for q in rng.choices(QUERIES, weights=weights, k=requests):
+        cached = rag.is_cached(q)
+        start  = time.perf_counter()
+        rag.answer(q)
+        (hits if cached else misses).append(time.perf_counter() - start)
+    return {
+        "requests": requests,
+        "hit_rate": len(hits) / requests if requests else 0.0,
+        "hit_latency":  percentiles(hits),
+        "miss_latency": percentiles(misses),
+    }
+
+
+# ─── Runner ────────────────────────────────────────────────────────────────────
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python":   platform.python_version(),
+        "platform": platform.platform(),
+        "cpus":     os.cpu_count(),
+        "commit":   commit,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline PromoSensei benchmarks.")
+    ap.add_argument("--offers", default=MASTER_FILE, help="base offer corpus (JSON)")
+    ap.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES))
+    ap.add_argument("--skip", nargs="*", default=[], choices=PHASES)
+    ap.add_argument("--query-rounds", type=int, default=3, help="passes over QUERIES for latency")
+    ap.add_argument("--cache-requests", type=int, default=200)
+    ap.add_argument("--out", help="result file (default: results/bench-<timestamp>.json)")
+    args = ap.parse_args(argv)
+    skip = set(args.skip)
+
+    report = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "env": environment(), "scales": {}}
+
+    if "scrape" not in skip:
+        print("▶ scrape (fixtures)")
+        report["scrape"] = bench_scrape()
+
+    base = OfferBatch.from_json(args.offers)
+    for factor in args.scales:
+        print(f"▶ scale {factor}× ({len(base) * factor} offers)")
+        batch = scale_batch(base, factor)
+        res   = report["scales"][str(factor)] = {"offers": len(batch)}
+
+        with tempfile.TemporaryDirectory(prefix=f"promobench-{factor}x-") as tmp:
+            workdir, db_dir = Path(tmp), Path(tmp) / "chroma"
+            write_corpus(batch, workdir)
+            if "load" not in skip:
+                res["load"] = bench_load(workdir)
+            # without a prior ingest, cold start includes embedding the corpus
+            if "ingest" not in skip:
+                res["ingest"] = bench_ingest(batch, db_dir)
+
+            if not {"cold", "query", "cache"} <= skip:
+                rag, res["cold_start"] = bench_cold_start(workdir, db_dir)
+                if "query" not in skip:
+                    res["query"] = bench_query(rag, args.query_rounds)
+                if "cache" not in skip:
+                    res["cache"] = bench_cache(rag, args.cache_requests)
+                del rag
+                gc.collect()
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"\nSaved → {out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+fixture_server.py
+
+Local stand-in for the retailer sites.  Serves the recorded Nykaa API pages
+and the Flipkart / PUMA HTML under benchmarks/fixtures/ so the scraper
+sources can run fully offline.  Responses carry an ETag and honour
+If-None-Match, as the delta fetches expect.
+
+    with FixtureServer() as srv:
+        sources = bench.fixture_sources(srv)
+"""
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+EMPTY_PAGE   = b'{"response": {"products": []}}'
+
+# path → fixture file (Nykaa API pages are resolved from page_no)
+ROUTES = {
+    "/flipkart/offers-store": ("flipkart/offers-store.html", "text/html; charset=utf-8"),
+    "/puma/motorsport":       ("puma/motorsport.html",       "text/html; charset=utf-8"),
+}
+NYKAA_API_PATH = "/nykaa/app-api/index.php/products/list"
+LAST_MODIFIED  = formatdate(usegmt=True)   # server start time
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == NYKAA_API_PATH:
+            page = parse_qs(parsed.query).get("page_no", ["1"])[0]
+            path = FIXTURES_DIR / "nykaa" / f"products_page_{page}.json"
+            body = path.read_bytes() if path.exists() else EMPTY_PAGE
+            return self._send(body, "application/json")
+
+        route = ROUTES.get(parsed.path)
+        if route is None:
+            return self.send_error(404)
+        name, ctype = route
+        return self._send((FIXTURES_DIR / name).read_bytes(), ctype)
+
+    def _send(self, body: bytes, ctype: str):
+        # Fixtures never change, so a strong ETag lets conditional fetches get a 304
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    """Serve the fixtures on an ephemeral localhost port for the `with` block."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self.base_url = f"http://{host}:{self._server.server_address[1]}"
+
+    @property
+    def nykaa_api_url(self) -> str:
+        return f"{self.base_url}{NYKAA_API_PATH}"
+
+    @property
+    def flipkart_url(self) -> str:
+        return f"{self.base_url}/flipkart/offers-store"
+
+    @property
+    def puma_url(self) -> str:
+        return f"{self.base_url}/puma/motorsport"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    with FixtureServer(port=8765) as srv:
+        print(f"Serving fixtures on {srv.base_url} (Ctrl-C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
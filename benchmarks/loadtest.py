@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+loadtest.py
+
+Load generator for the `/promosensei` command path.  Drives
+`slackbot.promosensei_handler` through a local stand-in for Bolt's
+socket-mode transport: requests arrive open-loop at a target rate and are
+dispatched on a fixed-size worker pool, as Bolt's listener executor does.
+
+Reports, overall and per subcommand: end-to-end latency, ack latency (Slack
+expects an ack within 3 s of delivery), queueing delay and error rate.
+
+    python -m benchmarks.loadtest --rate 2 --duration 60 --workers 10
+    python -m benchmarks.loadtest --rate 50 --fake-latency 0.2    # bot overhead only
+"""
+import os
+
+# Build the Bolt app without contacting Slack; models only from the local cache
+os.environ.setdefault("PROMOSENSEI_OFFLINE", "1")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.bench import QUERIES, RESULTS_DIR, environment, percentiles
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+ACK_DEADLINE = 3.0          # seconds Slack waits for an ack
+BOLT_WORKERS = 10           # Bolt's default listener thread pool size
+DEFAULT_MIX  = "search=70,summary=10,brand=20,refresh=0"
+BRANDS       = ["PUMA", "Nykaa", "Kay Beauty", "Lakme", "Maybelline", "boAt"]
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"search", "summary", "brand", "refresh"}
+    if unknown:
+        raise ValueError(f"Unknown subcommands in mix: {sorted(unknown)}")
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def command_text(subcmd: str, rng: random.Random) -> str:
+    if subcmd == "search":
+        return f"search {rng.choice(QUERIES)}"
+    if subcmd == "brand":
+        return f"brand {rng.choice(BRANDS)}"
+    return subcmd
+
+
+# ─── Slack stand-in ────────────────────────────────────────────────────────────
+class _Request:
+    """One slash command delivery plus the timings observed for it."""
+
+    __slots__ = ("subcmd", "text", "delivered", "started", "acked", "first_response",
+                 "finished", "responses", "error")
+
+    def __init__(self, subcmd: str, text: str, delivered: float):
+        self.subcmd         = subcmd
+        self.text           = text
+        self.delivered      = delivered
+        self.started        = None
+        self.acked          = None
+        self.first_response = None
+        self.finished       = None
+        self.responses      = []
+        self.error          = None
+
+    def ack(self, *args, **kwargs):
+        self.acked = time.perf_counter()
+
+    def respond(self, text=None, **kwargs):
+        if self.first_response is None:
+            self.first_response = time.perf_counter()
+        self.responses.append(text or "")
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or any(str(r).startswith("❌") for r in self.responses)
+
+
+class StubTransport:
+    """Stand-in for Bolt's socket-mode client: hands commands to a worker pool."""
+
+    def __init__(self, handler, workers: int = BOLT_WORKERS):
+        self.handler  = handler
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bolt-stub")
+
+    def deliver(self, req: _Request):
+        return self.executor.submit(self._run, req)
+
+    def _run(self, req: _Request):
+        req.started = time.perf_counter()
+        command = {
+            "command":    "/promosensei",
+            "text":       req.text,
+            "user_id":    "ULOADTEST",
+            "channel_id": "CLOADTEST",
+        }
+        try:
+            self.handler(ack=req.ack, respond=req.respond, command=command)
+        except Exception as e:
+            req.error = f"{type(e).__name__}: {e}"
+        req.finished = time.perf_counter()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+# ─── Runner ────────────────────────────────────────────────────────────────────
+def summarize(requests) -> dict:
+    done = [r for r in requests if r.finished is not None]
+    if not done:
+        return {"requests": 0}
+    acks = [r.acked - r.delivered for r in done if r.acked is not None]
+    return {
+        "requests":         len(done),
+        "error_rate":       sum(r.failed for r in done) / len(done),
+        "ack_missed_rate":  sum(1 for a in acks if a > ACK_DEADLINE) / len(done),
+        "latency":          percentiles([r.finished - r.delivered for r in done]),
+        "first_response":   percentiles([r.first_response - r.delivered for r in done if r.first_response]),
+        "ack":              percentiles(acks),
+        "queue_wait":       percentiles([r.started - r.delivered for r in done]),
+    }
+
+
+def run(rate: float, duration: float, mix: dict, workers: int, poisson: bool, seed: int) -> dict:
+    import slackbot
+
+    rng       = random.Random(seed)
+    names     = list(mix)
+    weights   = [mix[n] for n in names]
+    transport = StubTransport(slackbot.promosensei_handler, workers)
+    requests  = []
+
+    start    = time.perf_counter()
+    next_at  = start
+    while next_at - start < duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        subcmd = rng.choices(names, weights=weights)[0]
+        req = _Request(subcmd, command_text(subcmd, rng), time.perf_counter())
+        requests.append(req)
+        transport.deliver(req)
+        next_at += rng.expovariate(rate) if poisson else 1.0 / rate
+
+    transport.shutdown()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "offered_rate":  rate,
+        "achieved_rate": len(requests) / elapsed,
+        "elapsed":       elapsed,
+        "overall":       summarize(requests),
+        "by_subcommand": {s: summarize([r for r in requests if r.subcmd == s]) for s in names},
+    }
+    errors = sorted({r.error for r in requests if r.error})
+    if errors:
+        report["errors"] = errors[:20]
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load-test the /promosensei handler locally.")
+    ap.add_argument("--rate", type=float, default=1.0, help="commands per second offered")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    ap.add_argument("--workers", type=int, default=BOLT_WORKERS, help="handler threads (Bolt default 10)")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="weighted subcommand mix, e.g. search=70,brand=30")
+    ap.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of fixed")
+    ap.add_argument("--fake-latency", type=float, help="replace the RAG and refresh with a sleep of this many seconds")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="result file (default: results/loadtest-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    import slackbot
+    if args.fake_latency is not None:
+        def fake_answer(question):
+            time.sleep(args.fake_latency)
+            return f"stub answer for {question!r}"
+
+        slackbot.answer_query = fake_answer
+        def fake_refresh(site=None):
+            time.sleep(args.fake_latency)
+            return 0
+
+        slackbot.run_scraper_and_ingest = fake_refresh
+    else:
+        slackbot.get_rag()  # pay model loading before the clock starts
+
+    report = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "env":     environment(),
+        "config":  vars(args),
+        **run(args.rate, args.duration, parse_mix(args.mix), args.workers, args.poisson, args.seed),
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"\nSaved → {out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+compact_index.py
+
+Compressed first-pass index over a shard's embeddings.  Only the compressed
+copy lives in process memory; the full-precision float32 vectors stay on disk
+in a `VectorFile` and are read a handful of rows at a time to re-rank the
+first pass's candidates exactly.
+"""
+import os
+
+import numpy as np
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+STORAGE_MODES   = ("float32", "float16", "int8")
+_DTYPES         = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+RERANK_FACTOR   = 4        # first pass returns TOP_K * RERANK_FACTOR candidates
+SCORE_BLOCK     = 4096     # rows scored (or read from disk) at a time
+REFIT_GROWTH    = 2        # refit scales / IVF lists once the index outgrows its fit sample this many times
+IVF_MIN_ROWS    = 20000    # smaller indexes are scanned in full
+IVF_PROBES      = 16       # inverted lists scanned per query
+KMEANS_ITERS    = 8
+KMEANS_SAMPLE   = 64       # training rows per list
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+# ─── VectorFile Class ──────────────────────────────────────────────────────────
+class VectorFile:
+    """
+    float32 rows in a flat file.  Rows are read with pread() when needed and
+    never mapped, so they cost page cache, not resident memory.
+    """
+
+    def __init__(self, path, dim: int):
+        self.path = str(path)
+        self.dim  = dim
+        self._row = dim * 4
+        self._fd  = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __len__(self):
+        return os.fstat(self._fd).st_size // self._row
+
+    def read(self, rows) -> np.ndarray:
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            out[i] = np.frombuffer(os.pread(self._fd, self._row, int(row) * self._row), dtype=np.float32)
+        return out
+
+    def blocks(self, size: int = SCORE_BLOCK, rows: int = None):
+        """Yield (first row, rows) over the first `rows` rows (default all), `size` at a time."""
+        total = len(self) if rows is None else min(rows, len(self))
+        for start in range(0, total, size):
+            n   = min(size, total - start)
+            buf = os.pread(self._fd, n * self._row, start * self._row)
+            yield start, np.frombuffer(buf, dtype=np.float32).reshape(n, self.dim)
+
+    def write(self, rows, vecs):
+        """Write `vecs` at row numbers `rows`; row len(self) onwards appends."""
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+        rows = [int(r) for r in rows]
+        if rows and rows == list(range(rows[0], rows[0] + len(rows))):
+            os.pwrite(self._fd, vecs.tobytes(), rows[0] * self._row)
+            return
+        for row, vec in zip(rows, vecs):
+            os.pwrite(self._fd, vec.tobytes(), row * self._row)
+
+    def truncate(self, rows: int):
+        os.ftruncate(self._fd, rows * self._row)
+
+    def sync(self):
+        os.fsync(self._fd)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
+
+
+# ─── Coarse quantizer ──────────────────────────────────────────────────────────
+def _kmeans(vecs: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalised rows → (k, dim) unit centroids."""
+    rng       = np.random.default_rng(seed)
+    centroids = vecs[rng.choice(len(vecs), size=k, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        assign = np.argmax(vecs @ centroids.T, axis=1)
+        sums   = np.zeros_like(centroids)
+        np.add.at(sums, assign, vecs)
+        empty  = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]           # keep an emptied centroid where it was
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+def _group(rows: np.ndarray, assign: np.ndarray, nlist: int) -> list:
+    """Row numbers of each inverted list."""
+    order  = np.argsort(assign, kind="stable")
+    bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+    return [rows[order[bounds[c]:bounds[c + 1]]] for c in range(nlist)]
+
+
+# ─── CompactIndex Class ────────────────────────────────────────────────────────
+class CompactIndex:
+    """
+    Cosine-similarity index whose row i is row i of `full`.
+
+    * float32 – uncompressed copy, 4 bytes per dimension.
+    * float16 – half-precision copy, 2 bytes per dimension.
+    * int8    – per-dimension symmetric scalar quantization, 1 byte per
+                dimension plus one float32 scale per dimension.
+
+    Scales (int8) and, from IVF_MIN_ROWS rows, an inverted-file partition are
+    fitted on the whole file, and refitted whenever the index has grown
+    REFIT_GROWTH times past the rows they were fitted on.  Rows added in
+    between reuse them; int8 values outside the fitted range are clipped,
+    which only costs first-pass precision.
+
+    Writers must be serialised by the caller; searches may run alongside them.
+    """
+
+    def __init__(self, full: VectorFile, mode: str = "int8"):
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown vector storage mode {mode!r}; use one of {STORAGE_MODES}")
+        self.full      = full
+        self.mode      = mode
+        self.ids       = []
+        self._fit_rows = 0
+        # (codes, scale, centroids, lists, assign), replaced as a whole so a
+        # search always sees one consistent fit
+        self._state    = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.full.dim
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory: compressed vectors, int8 scales and IVF lists."""
+        if self._state is None:
+            return 0
+        codes, scale, centroids, lists, assign = self._state
+        total = codes.nbytes
+        for part in (scale, centroids, assign):
+            if part is not None:
+                total += part.nbytes
+        return total + sum(l.nbytes for l in lists or ())
+
+    # ── Building ──────────────────────────────────────────────────────────────
+    def _encode(self, vecs: np.ndarray, scale) -> np.ndarray:
+        if self.mode == "float32":
+            return vecs.astype(np.float32)
+        if self.mode == "float16":
+            return vecs.astype(np.float16)
+        return np.clip(np.rint(vecs / scale), -127, 127).astype(np.int8)
+
+    def _fit(self):
+        """Fit scales and IVF lists on every row of the file and re-encode it."""
+        n     = len(self.ids)
+        scale = None
+        if self.mode == "int8":
+            scale = np.zeros(self.dim, dtype=np.float32)
+            for _, block in self.full.blocks(rows=n):
+                np.maximum(scale, np.abs(_normalize(block)).max(axis=0), out=scale)
+            scale /= 127.0
+            scale[scale == 0] = 1.0
+
+        centroids = None
+        if n >= IVF_MIN_ROWS:
+            nlist  = int(np.sqrt(n))
+            sample = np.random.default_rng(0).choice(n, size=min(n, nlist * KMEANS_SAMPLE), replace=False)
+            centroids = _kmeans(_normalize(self.full.read(np.sort(sample))), nlist)
+
+        codes  = np.empty((n, self.dim), dtype=_DTYPES[self.mode])
+        assign = np.empty(n, dtype=np.int32) if centroids is not None else None
+        for start, block in self.full.blocks(rows=n):
+            block = _normalize(block)
+            codes[start:start + len(block)] = self._encode(block, scale)
+            if assign is not None:
+                assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        lists = _group(np.arange(n, dtype=np.int32), assign, len(centroids)) if assign is not None else None
+        self._fit_rows = n
+        self._state    = (codes, scale, centroids, lists, assign)
+
+    def load(self, ids):
+        """Index `ids`, the IDs of the rows already in `full`, in row order."""
+        self.ids = list(ids)
+        self._fit()
+
+    def add(self, ids, embeddings):
+        """Index new IDs whose vectors were just appended to `full`."""
+        if len(ids) == 0:
+            return
+        # IDs first: a concurrent search only scores rows that already have one
+        self.ids.extend(ids)
+        if self._state is None or len(self.ids) > REFIT_GROWTH * self._fit_rows:
+            self._fit()
+            return
+
+        codes, scale, centroids, lists, assign = self._state
+        vecs  = _normalize(np.asarray(embeddings, dtype=np.float32))
+        codes = np.vstack([codes, self._encode(vecs, scale)])
+        if centroids is not None:
+            rows   = np.arange(len(assign), len(assign) + len(vecs), dtype=np.int32)
+            new    = np.argmax(vecs @ centroids.T, axis=1).astype(np.int32)
+            lists  = list(lists)
+            for c, part in enumerate(_group(rows, new, len(centroids))):
+                if len(part):
+                    lists[c] = np.concatenate([lists[c], part])
+            assign = np.concatenate([assign, new])
+        self._state = (codes, scale, centroids, lists, assign)
+
+    def upsert(self, ids, embeddings):
+        """
+        Re-encode the IDs already indexed (their rows in `full` were
+        overwritten in place) and add the rest, which `full` appended.
+        """
+        if len(ids) == 0:
+            return
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        pos  = {cid: i for i, cid in enumerate(self.ids)}
+        old  = [j for j, cid in enumerate(ids) if cid in pos]
+        new  = [j for j, cid in enumerate(ids) if cid not in pos]
+        if old:
+            rows = np.array([pos[ids[j]] for j in old], dtype=np.int32)
+            norm = _normalize(vecs[old])
+            codes, scale, centroids, lists, assign = self._state
+            codes[rows] = self._encode(norm, scale)
+            if centroids is not None:
+                moved = np.argmax(norm @ centroids.T, axis=1).astype(np.int32)
+                lists = list(lists)
+                for row, c in zip(rows, moved):
+                    if assign[row] != c:
+                        lists[assign[row]] = lists[assign[row]][lists[assign[row]] != row]
+                        lists[c]           = np.append(lists[c], row).astype(np.int32)
+                        assign[row]        = c
+                self._state = (codes, scale, centroids, lists, assign)
+        if new:
+            self.add([ids[j] for j in new], vecs[new])
+
+    # ── Searching ─────────────────────────────────────────────────────────────
+    def candidates(self, query, n: int):
+        """Approximate top-n from the compressed vectors → [(row, score)]."""
+        if self._state is None:
+            return []
+        codes, scale, centroids, lists, _ = self._state
+        q = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+
+        rows = None
+        if centroids is not None:
+            probes = np.argpartition(-(centroids @ q), min(IVF_PROBES, len(centroids)) - 1)[:IVF_PROBES]
+            rows   = np.concatenate([lists[c] for c in probes])
+        if self.mode == "int8":
+            # (codes * scale) · q  ==  codes · (scale * q)
+            q = q * scale
+
+        # Score in blocks so a search never materialises a full float32 copy
+        total  = len(codes) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK] if rows is None else codes[rows[start:start + SCORE_BLOCK]]
+            scores[start:start + len(block)] = block.astype(np.float32) @ q
+        if not total:
+            return []
+
+        n   = min(n, total)
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i if rows is None else rows[i]), float(scores[i])) for i in top]
+
+    def search(self, query, k: int):
+        """Top-k as [(row, id, score)]: first pass here, exact re-rank from `full`."""
+        cands = self.candidates(query, k * RERANK_FACTOR)
+        if not cands:
+            return []
+        rows  = [row for row, _ in cands]
+        q     = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        score = _normalize(self.full.read(rows)) @ q
+        order = np.argsort(-score)[:k]
+        return [(rows[i], self.ids[rows[i]], float(score[i])) for i in order]
+
+
+def recall_at_k(exact_ids, approx_ids, k: int = 3) -> float:
+    """Fraction of the exact top-k that also appears in the approximate top-k."""
+    exact = list(exact_ids)[:k]
+    if not exact:
+        return 1.0
+    return len(set(exact) & set(list(approx_ids)[:k])) / len(exact)
+
+
+# ─── CLI: footprint & recall check ─────────────────────────────────────────────
+if __name__ == "__main__":
+    import argparse
+    from shards import ShardStore, list_stores
+
+    ap = argparse.ArgumentParser(description="Compare compact storage against float32 on the stored offers.")
+    ap.add_argument("--db", default="./chroma_db")
+    ap.add_argument("--shard", action="append", help="shard name(s); default: all shards")
+    ap.add_argument("--mode", default="int8", choices=STORAGE_MODES)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--queries", type=int, default=200, help="stored vectors reused as queries")
+    args = ap.parse_args()
+
+    recalls, rows, dim, nbytes = [], 0, 0, 0
+    rng = np.random.default_rng(0)
+    for name in args.shard or list_stores(args.db):
+        store = ShardStore(args.db, name)
+        if not len(store):
+            continue
+        idx = CompactIndex(store.vectors, args.mode)
+        idx.load(store.ids)
+        exact = _normalize(np.vstack([b for _, b in store.vectors.blocks()]))
+        rows, dim, nbytes = rows + len(idx), idx.dim, nbytes + idx.nbytes
+
+        for qi in rng.choice(len(idx), size=min(args.queries, len(idx)), replace=False):
+            q         = exact[qi]
+            exact_top = [idx.ids[i] for i in np.argsort(-(exact @ q))[:args.k]]
+            approx    = [cid for _, cid, _ in idx.search(q, args.k)]
+            recalls.append(recall_at_k(exact_top, approx, args.k))
+    if not rows:
+        raise SystemExit("No vectors stored.")
+
+    full = rows * dim * 4
+    print(f"{rows} vectors × {dim} dims")
+    print(f"float32 : {full / 1024:.1f} KB (on disk, read per candidate)")
+    print(f"{args.mode:<8}: {nbytes / 1024:.1f} KB in memory ({full / max(nbytes, 1):.1f}× smaller)")
+    print(f"recall@{args.k} after re-rank: {np.mean(recalls):.4f} over {len(recalls)} queries")
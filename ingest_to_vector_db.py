@@ -1,86 +1,116 @@
 #!/usr/bin/env python3
-import json
-import uuid
+import argparse
+
 from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+
+from metrics import metrics
+from offers import DELTA_FILE, MASTER_FILE, SNAPSHOT_FILE, clear_delta, load_offers, pending_delta
+from shards import ShardStore, open_client, shard_site, site_slug, split_shards, upsert_shard
 
 # ─── Configuration ─────────────────────────────────────────────────────────────
 _EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
 _embed_model     = SentenceTransformer(_EMBED_MODEL_NAME, device="cpu")
 DB_PATH          = "./chroma_db"
-COLLECTION_NAME  = "promo_offers"
-OFFERS_FILE      = "scrapping\master_offers.json"
-
-
-def load_offers(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
+OFFERS_FILE      = MASTER_FILE
+SNAPSHOT_PATH    = SNAPSHOT_FILE
+DELTA_PATH       = DELTA_FILE
+METRICS_FILE     = "metrics_ingest.json"
 
-def to_embed_text(o: dict) -> str:
-    return f"{o.get('title','')}. {o.get('description','')}"
 
+def ingest_offers(col, offers, show_progress_bar=False, store=None) -> int:
+    """Embed deduped `offers` (an OfferBatch) and upsert them into `col` and `store`."""
+    # Prepare docs & metadata column-wise; the link is the document ID
+    ids   = offers.column("link")
+    docs  = offers.embed_texts()
+    metas = offers.metadatas()
 
-def get_collection():
-    client = chromadb.PersistentClient(
-        path=DB_PATH,
-        settings=Settings(),
-        tenant=DEFAULT_TENANT,
-        database=DEFAULT_DATABASE,
-    )
-    return client.get_or_create_collection(COLLECTION_NAME)
+    # Batch-encode
+    print(f"Computing embeddings for {len(docs)} documents...")
+    with metrics.timer("embed_seconds", path="ingest"):
+        embeddings = _embed_model.encode(docs, show_progress_bar=show_progress_bar)
+
+    # Upsert into ChromaDB and the shard's store
+    with metrics.timer("vector_upsert_seconds", path="ingest"):
+        upsert_shard(col, store, ids, docs, metas, embeddings)
+    metrics.inc("items_ingested_total", len(ids), path="ingest")
+    return len(ids)
+
+
+def ingest_sharded(client, offers, sites=None, rebuild=False, show_progress_bar=False, db_path=DB_PATH) -> dict:
+    """
+    Split deduped `offers` into per-site shards and ingest each one, into its
+    Chroma collection and its store under `db_path`; with `sites`, only those
+    sites' shards are touched.  `rebuild` drops a shard's collection and store
+    first so they end up matching the offer file exactly.
+    Returns {shard name: offers ingested}.
+    """
+    wanted = {site_slug(s) for s in sites} if sites else None
+    counts = {}
+    for name, part in split_shards(offers).items():
+        if wanted is not None and shard_site(name) not in wanted:
+            continue
+        store = ShardStore(db_path, name)
+        if rebuild:
+            try:
+                client.delete_collection(name)
+            except Exception:  # not created yet (error type differs across Chroma versions)
+                pass
+            store.clear()
+        with metrics.timer("shard_ingest_seconds", shard=shard_site(name)):
+            counts[name] = ingest_offers(client.get_or_create_collection(name), part, show_progress_bar, store)
+        store.close()
+    return counts
+
+
+def main(sites=None, rebuild=False, delta=False, db_path=DB_PATH, delta_path=DELTA_PATH):
+    # 1. Load scraped offers: the whole file, or only those changed since the last ingest
+    pending = pending_delta(delta_path, sites, OFFERS_FILE, SNAPSHOT_PATH)
+    if delta:
+        if not len(pending):
+            print(f"No pending changes in {delta_path}; nothing to ingest")
+            return
+        offers = pending
+        print(f"Loaded {len(offers)} new or changed offers from {delta_path}")
+    else:
+        with metrics.timer("load_seconds", path="ingest"):
+            offers = load_offers(OFFERS_FILE, SNAPSHOT_PATH)
+        print(f"Loaded {len(offers)} offers from {OFFERS_FILE} / {SNAPSHOT_PATH}")
+
+    # 2. Dedupe on link (same IDs LiveRAG uses), so re-runs upsert instead of piling up
+    offers = offers.with_link().dedup()
+    print(f"{len(offers)} unique offers to ingest")
 
+    # 3. Connect to ChromaDB
+    client = open_client(db_path)
 
-def main():
-    # 1. Load scraped offers
-    offers = load_offers(OFFERS_FILE)
-    print(f"Loaded {len(offers)} offers from {OFFERS_FILE}")
+    # 4-6. Embed and upsert, one collection (and store) per site shard
+    counts = ingest_sharded(client, offers, sites=sites, rebuild=rebuild, show_progress_bar=True, db_path=db_path)
+    for name, n in counts.items():
+        print(f"Ingested {n} offers into {name} at {db_path}")
+    # pending changes are in the vector store now, whichever way they were loaded
+    clear_delta(pending, delta_path, OFFERS_FILE, SNAPSHOT_PATH)
 
-    # 2. No dedupe—ingest all records including duplicates
-    all_offers = offers
-    print(f"{len(all_offers)} offers to ingest (including duplicates)")
+    # 7. Optional test query (loads whole collections into memory; skipped for delta runs)
+    if not delta:
+        test_query = "flat 50% off deals today"
+        q_emb = _embed_model.encode(test_query).tolist()
+        for name in counts:
+            results = client.get_collection(name).query(query_embeddings=[q_emb], n_results=5)
+            print(f"\nTop 5 results in {name} for: {test_query}")
+            for i, md in enumerate(results["metadatas"][0], 1):
+                print(f"{i}. {md}")
 
-    # 3. Connect to ChromaDB
-    col = get_collection()
-
-    # 4. Prepare docs & metadata, assign unique IDs
-    ids, docs, metas = [], [], []
-    for o in all_offers:
-        doc_id = str(uuid.uuid4())
-        ids.append(doc_id)
-        docs.append(to_embed_text(o))
-        metas.append({
-            "brand":    o.get("brand",""),
-            "expiry":   o.get("expiry",""),
-            "link":     o.get("link",""),
-            "category": o.get("category",""),
-            "discount": str(o.get("discount","")),
-            "image":    o.get("image",""),
-            "channel":  o.get("channel",""),
-        })
-
-    # 5. Batch-encode
-    print(f"Computing embeddings for {len(docs)} documents...")
-    embeddings = _embed_model.encode(docs, show_progress_bar=True).tolist()
-
-    # 6. Append to ChromaDB
-    col.add(
-        ids=ids,
-        documents=docs,
-        metadatas=metas,
-        embeddings=embeddings
-    )
-    print(f"Ingested {len(ids)} offers into ChromaDB at {DB_PATH}")
-
-    # 7. Optional test query
-    test_query = "flat 50% off deals today"
-    q_emb = _embed_model.encode(test_query).tolist()
-    results = col.query(query_embeddings=[q_emb], n_results=5)
-    print(f"\nTop 5 results for: {test_query}")
-    for i, md in enumerate(results["metadatas"][0], 1):
-        print(f"{i}. {md}")
+    metrics.dump_json(METRICS_FILE)
 
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="Embed scraped offers into per-site Chroma shards.")
+    ap.add_argument("--site", action="append", help="only ingest this site's shard (repeatable)")
+    ap.add_argument("--rebuild", action="store_true", help="drop and rebuild the selected shards")
+    ap.add_argument("--delta", action="store_true", help="only embed offers the scraper reported as new or changed")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--delta-file", default=DELTA_PATH)
+    args = ap.parse_args()
+    if args.delta and args.rebuild:
+        ap.error("--delta and --rebuild are mutually exclusive")
+    main(sites=args.site, rebuild=args.rebuild, delta=args.delta, db_path=args.db, delta_path=args.delta_file)
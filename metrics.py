@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+metrics.py
+
+Shared, dependency-free instrumentation for the scraper, ingestion, LiveRAG
+and the Slack bot: labelled counters and latency histograms, exposed in
+Prometheus text format over a local HTTP endpoint and as a JSON dump.
+
+    from metrics import metrics
+    with metrics.timer("embed_seconds", stage="query"):
+        ...
+    metrics.inc("items_scraped_total", len(offers), site="Nykaa")
+"""
+import json
+import threading
+from bisect import bisect_left
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+METRICS_PORT    = 9108
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_str(key: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# ─── Metric types ──────────────────────────────────────────────────────────────
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+
+# ─── Registry ──────────────────────────────────────────────────────────────────
+class Registry:
+    def __init__(self):
+        self._lock       = threading.Lock()
+        self._counters   = {}   # name -> {label_key: value}
+        self._histograms = {}   # name -> {label_key: _Histogram}
+        self._server     = None
+
+    # ── Recording ─────────────────────────────────────────────────────────────
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(DEFAULT_BUCKETS)
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the wall-clock seconds spent in the block into `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ── Export ────────────────────────────────────────────────────────────────
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels":  dict(k),
+                        "count":   h.count,
+                        "sum":     h.sum,
+                        "mean":    h.sum / h.count if h.count else 0.0,
+                        "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts)),
+                    }
+                    for k, h in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def dump_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_label_str(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, n in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                        cumulative += n
+                        le = f'le="{bound}"'
+                        lines.append(f"{name}_bucket{_label_str(key, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_label_str(key)} {h.sum}")
+                    lines.append(f"{name}_count{_label_str(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    # ── HTTP endpoint ─────────────────────────────────────────────────────────
+    def start_http_server(self, port: int = METRICS_PORT, host: str = "127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /metrics.json on a daemon thread."""
+        if self._server is not None:
+            return self._server
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, ctype = json.dumps(registry.to_dict()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, ctype = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep scrapes out of the app log
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[metrics] Serving http://{host}:{port}/metrics and /metrics.json")
+        return self._server
+
+
+# Process-wide registry shared by every module
+metrics = Registry()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+offers.py
+
+Shared offer data model used by the scraper, ingestion and LiveRAG.
+
+* `Offer`      – one typed record (`__slots__` dataclass), built by scrapers.
+* `OfferBatch` – columnar Arrow form of many offers for bulk work: loading,
+                 filtering, dedup, embedding text and Chroma metadata.
+
+Alongside the human-readable JSON the scraper writes a versioned,
+zstd-compressed Arrow IPC (Feather v2) snapshot; `load_offers` prefers it
+and reads only the requested columns through a memory map.  New or changed
+offers are also appended to a delta file until they have been embedded.
+"""
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import Iterable, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:   # Windows: only writers within one process are serialised
+    fcntl = None
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+MASTER_FILE          = "master_offers.json"
+SNAPSHOT_FILE        = "master_offers.arrow"
+DELTA_FILE           = "changed_offers.json"   # scraped offers not yet embedded
+SNAPSHOT_VERSION     = "2"
+SNAPSHOT_COMPRESSION = "zstd"
+_VERSION_KEY         = b"promo_offers.snapshot_version"
+
+# ─── Schema ────────────────────────────────────────────────────────────────────
+SCHEMA = pa.schema([
+    ("site",          pa.string()),
+    ("title",         pa.string()),
+    ("description",   pa.string()),
+    ("expiry",        pa.string()),
+    ("brand",         pa.string()),
+    ("link",          pa.string()),
+    ("discount",      pa.float64()),   # percent off, null when unknown or not a percentage
+    ("discount_text", pa.string()),    # the retailer's own wording, for display
+    ("image",         pa.string()),
+    ("category",      pa.int64()),     # retailer category ID, null when unknown
+    ("channel",       pa.string()),
+])
+
+# Columns copied into Chroma metadata alongside each document
+METADATA_COLUMNS = ("site", "brand", "expiry", "link", "category", "discount", "discount_text", "image", "channel")
+
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_NUMBER  = re.compile(r"\s*(\d+(?:\.\d+)?)\s*")
+
+
+def parse_discount(raw, bare_percent: bool = False) -> Optional[float]:
+    """
+    Percent off, rounded to 2 places: '35% off', 'Flat 35 %' → 35.0.  Bare
+    numbers (35, '35') only count when `bare_percent` says the source reports
+    percentages; '₹200 off' or 'Buy 2 Get 1' → None.
+    """
+    if raw is None or raw == "" or isinstance(raw, bool):
+        return None
+    if isinstance(raw, (int, float)):
+        return round(float(raw), 2) if bare_percent else None
+    m = _PERCENT.search(str(raw))
+    if m is None and bare_percent:
+        m = _NUMBER.fullmatch(str(raw))
+    return round(float(m.group(1)), 2) if m else None
+
+
+def parse_category(raw) -> Optional[int]:
+    if raw is None or raw == "":
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def site_slug(site: str) -> str:
+    """'Nykaa' → 'nykaa', 'Tata CLiQ' → 'tata-cliq'; used for shard names and --site."""
+    slug = re.sub(r"[^a-z0-9]+", "-", (site or "").lower()).strip("-")
+    return slug or "unknown"
+
+
+def _text(raw) -> str:
+    return "" if raw is None or isinstance(raw, (int, float)) else str(raw).strip()
+
+
+# ─── Offer Record ──────────────────────────────────────────────────────────────
+@dataclass(slots=True)
+class Offer:
+    site:          str = ""
+    title:         str = ""
+    description:   str = ""
+    expiry:        str = ""
+    brand:         str = ""
+    link:          str = ""
+    discount:      Optional[float] = None
+    discount_text: str = ""
+    image:         str = ""
+    category:      Optional[int] = None
+    channel:       str = ""
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Offer":
+        """Build from a raw JSON dict, tolerating the old all-strings layout."""
+        return cls(
+            site=d.get("site") or "",
+            title=d.get("title") or "",
+            description=d.get("description") or "",
+            expiry=d.get("expiry") or "",
+            brand=d.get("brand") or "",
+            link=d.get("link") or "",
+            # `discount` is ours (a percentage) once `discount_text` exists; the
+            # old layout only had Nykaa's bare API numbers, also percentages
+            discount=parse_discount(d.get("discount"), bare_percent=True),
+            discount_text=d.get("discount_text") or _text(d.get("discount")),
+            image=d.get("image") or "",
+            category=parse_category(d.get("category")),
+            channel=d.get("channel") or "",
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_FIELDS = [f.name for f in fields(Offer)]
+
+
+# ─── OfferBatch (columnar) ─────────────────────────────────────────────────────
+class OfferBatch:
+    """Thin wrapper around a `pyarrow.Table` with the offer `SCHEMA`."""
+
+    __slots__ = ("table",)
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    # ── Construction ──────────────────────────────────────────────────────────
+    @classmethod
+    def empty(cls) -> "OfferBatch":
+        return cls(SCHEMA.empty_table())
+
+    @classmethod
+    def from_offers(cls, offers: Iterable[Offer]) -> "OfferBatch":
+        offers = list(offers)
+        cols = {name: [getattr(o, name) for o in offers] for name in _FIELDS}
+        return cls(pa.Table.from_pydict(cols, schema=SCHEMA))
+
+    @classmethod
+    def from_dicts(cls, dicts: Iterable[dict]) -> "OfferBatch":
+        return cls.from_offers(Offer.from_dict(d) for d in dicts)
+
+    @classmethod
+    def from_json(cls, path) -> "OfferBatch":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            return cls.empty()
+        return cls.from_dicts(data)
+
+    @classmethod
+    def from_snapshot(cls, path, columns=None) -> "OfferBatch":
+        """
+        Memory-map an Arrow snapshot and read only `columns` (all if None).
+        Raises ValueError if the snapshot was written with another version.
+        """
+        table   = feather.read_table(str(path), columns=columns, memory_map=True)
+        version = (table.schema.metadata or {}).get(_VERSION_KEY, b"").decode()
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot {path} has version {version!r}, expected {SNAPSHOT_VERSION!r}")
+        return cls(table)
+
+    @classmethod
+    def concat(cls, *batches: "OfferBatch") -> "OfferBatch":
+        return cls(pa.concat_tables([b.table for b in batches]))
+
+    # ── Output ────────────────────────────────────────────────────────────────
+    def to_json(self, path):
+        """Write the rows as a JSON list (atomically, so readers never see half a file)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.table.to_pylist(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def to_snapshot(self, path):
+        """Write a versioned, compressed Arrow IPC snapshot (atomically)."""
+        table = self.table.replace_schema_metadata({_VERSION_KEY: SNAPSHOT_VERSION})
+        tmp   = f"{path}.tmp"
+        feather.write_feather(table, tmp, compression=SNAPSHOT_COMPRESSION)
+        os.replace(tmp, path)
+
+    # ── Column operations ─────────────────────────────────────────────────────
+    def column(self, name: str):
+        return self.table.column(name).to_pylist()
+
+    def filter(self, mask) -> "OfferBatch":
+        return OfferBatch(self.table.filter(mask))
+
+    def with_link(self) -> "OfferBatch":
+        """Drop rows without a link (they cannot be identified or deduped)."""
+        link = self.table.column("link")
+        return self.filter(pc.and_(pc.is_valid(link), pc.not_equal(link, "")))
+
+    def exclude(self, values, key: str = "link") -> "OfferBatch":
+        """Drop rows whose `key` is in `values` (e.g. IDs already indexed)."""
+        if not values:
+            return self
+        seen = pc.is_in(self.table.column(key), value_set=pa.array(list(values), pa.string()))
+        return self.filter(pc.invert(seen))
+
+    def dedup(self, key: str = "link") -> "OfferBatch":
+        """Keep the last row for each distinct `key` (newest scrape wins)."""
+        if not len(self):
+            return self
+        idx = self.table.append_column("__row", pa.array(range(len(self)), pa.int64()))
+        last = idx.group_by(key, use_threads=False).aggregate([("__row", "max")])
+        keep = pc.sort_indices(last.column("__row_max"))
+        return OfferBatch(self.table.take(pc.take(last.column("__row_max"), keep)))
+
+    def site_slugs(self):
+        """`site_slug` of every row's site, computed column-wise."""
+        slug = pc.utf8_lower(pc.fill_null(self.table.column("site"), ""))
+        slug = pc.utf8_trim(pc.replace_substring_regex(slug, "[^a-z0-9]+", "-"), "-")
+        return pc.if_else(pc.equal(slug, ""), "unknown", slug)
+
+    def embed_texts(self):
+        """`title. description` for every row, joined column-wise."""
+        title = pc.fill_null(self.table.column("title"), "")
+        desc  = pc.fill_null(self.table.column("description"), "")
+        return pc.binary_join_element_wise(title, desc, ". ").to_pylist()
+
+    def metadatas(self):
+        """Chroma metadata dicts; null fields are left out."""
+        cols = [self.table.column(c).to_pylist() for c in METADATA_COLUMNS]
+        return [
+            {k: v for k, v in zip(METADATA_COLUMNS, row) if v is not None}
+            for row in zip(*cols)
+        ]
+
+
+# ─── Loading ───────────────────────────────────────────────────────────────────
+def load_offers(json_path=MASTER_FILE, snapshot_path=SNAPSHOT_FILE, columns=None) -> OfferBatch:
+    """
+    Load the offer corpus, preferring the Arrow snapshot when it exists and is
+    at least as new as the JSON; otherwise fall back to parsing the JSON, and
+    to the older snapshot if the JSON does not parse.
+    """
+    json_mtime = os.path.getmtime(json_path) if os.path.exists(json_path) else None
+    if snapshot_path and os.path.exists(snapshot_path):
+        if json_mtime is None or os.path.getmtime(snapshot_path) >= json_mtime:
+            try:
+                return OfferBatch.from_snapshot(snapshot_path, columns=columns)
+            except (ValueError, pa.ArrowInvalid) as e:
+                print(f"[offers] Ignoring snapshot {snapshot_path}: {e}")
+
+    if json_mtime is None:
+        return OfferBatch.empty()
+    try:
+        batch = OfferBatch.from_json(json_path)
+    except json.JSONDecodeError as e:
+        if not (snapshot_path and os.path.exists(snapshot_path)):
+            raise
+        print(f"[offers] {json_path} does not parse ({e}); loading {snapshot_path} instead")
+        return OfferBatch.from_snapshot(snapshot_path, columns=columns)
+    if columns is not None:
+        batch = OfferBatch(batch.table.select(columns))
+    return batch
+
+
+# ─── Delta ─────────────────────────────────────────────────────────────────────
+# The scraper appends new or changed offers to DELTA_FILE; ingestion and LiveRAG
+# embed just those and clear them once they are in the vector store.  Writers
+# hold an exclusive lock on `<delta>.lock` for the whole read-modify-write, and
+# replace the file atomically, so readers need no lock.
+_delta_mutex = threading.Lock()
+
+
+@contextmanager
+def _delta_lock(path):
+    with _delta_mutex, open(f"{path}.lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)   # released when the file is closed
+        yield
+
+
+def _read_delta(path, json_path, snapshot_path) -> OfferBatch:
+    try:
+        return OfferBatch.from_json(path)
+    except json.JSONDecodeError as e:
+        # whatever it queued is lost, but the corpus holds those offers too
+        print(f"[offers] {path} does not parse ({e}); treating every offer on file as pending")
+        return load_offers(json_path, snapshot_path).with_link().dedup()
+
+
+def append_delta(batch: OfferBatch, path=DELTA_FILE, json_path=MASTER_FILE, snapshot_path=SNAPSHOT_FILE):
+    with _delta_lock(path):
+        if os.path.exists(path):
+            batch = OfferBatch.concat(_read_delta(path, json_path, snapshot_path), batch).dedup()
+        batch.to_json(path)
+
+
+def pending_delta(path=DELTA_FILE, sites=None, json_path=MASTER_FILE, snapshot_path=SNAPSHOT_FILE) -> OfferBatch:
+    """
+    Offers waiting to be embedded, optionally only those of `sites`.  If the
+    delta file does not parse, every offer in the corpus is pending.
+    """
+    if not os.path.exists(path):
+        return OfferBatch.empty()
+    batch = _read_delta(path, json_path, snapshot_path)
+    if sites:
+        wanted = pa.array(sorted({site_slug(s) for s in sites}), pa.string())
+        batch  = batch.filter(pc.is_in(batch.site_slugs(), value_set=wanted))
+    return batch
+
+
+def clear_delta(applied: OfferBatch, path=DELTA_FILE, json_path=MASTER_FILE, snapshot_path=SNAPSHOT_FILE):
+    """Drop the rows of `applied` from the delta file; changes appended since stay."""
+    with _delta_lock(path):
+        if not os.path.exists(path):
+            return
+        done = {json.dumps(row, sort_keys=True) for row in applied.table.to_pylist()}
+        rest = [row for row in _read_delta(path, json_path, snapshot_path).table.to_pylist()
+                if json.dumps(row, sort_keys=True) not in done]
+        if rest:
+            OfferBatch.from_dicts(rest).to_json(path)
+        else:
+            os.remove(path)
+
+
+# ─── CLI: convert JSON → snapshot ──────────────────────────────────────────────
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Write an Arrow snapshot of the offer JSON and compare load cost.")
+    ap.add_argument("--json", default=MASTER_FILE)
+    ap.add_argument("--snapshot", default=SNAPSHOT_FILE)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    batch = OfferBatch.from_json(args.json)
+    t_json = time.perf_counter() - t0
+    batch.to_snapshot(args.snapshot)
+
+    t0 = time.perf_counter()
+    OfferBatch.from_snapshot(args.snapshot)
+    t_snap = time.perf_counter() - t0
+
+    size_json, size_snap = os.path.getsize(args.json), os.path.getsize(args.snapshot)
+    print(f"{len(batch)} offers → {args.snapshot}")
+    print(f"size: {size_json / 1024:.1f} KB JSON vs {size_snap / 1024:.1f} KB snapshot ({size_json / size_snap:.1f}×)")
+    print(f"load: {t_json * 1000:.1f} ms JSON vs {t_snap * 1000:.1f} ms snapshot ({t_json / max(t_snap, 1e-9):.1f}×)")
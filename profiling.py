@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+
+Opt-in, per-request profiling for the RAG hot path and the scrapers.
+
+    with profile("answer") as prof:
+        ...
+    print(prof.paths)
+
+Each profiled block writes three files under PROFILE_DIR:
+
+* <name>-<stamp>.prof    – cProfile stats (pstats / snakeviz)
+* <name>-<stamp>.folded  – sampled call stacks in collapsed format
+                           (flamegraph.pl, speedscope, inferno)
+* <name>-<stamp>.json    – wall time plus torch / BLAS thread settings
+
+Nothing here runs unless a caller opts in, so normal requests only pay for
+an `if` on their flag.
+"""
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+PROFILE_DIR     = os.environ.get("PROMOSENSEI_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = 0.005       # seconds between stack samples (GIL-bound in practice)
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TOKENIZERS_PARALLELISM")
+
+# cProfile cannot run in two threads at once; profiled requests take turns
+_active = threading.Lock()
+_seq    = itertools.count(1)
+_local  = threading.local()    # .on is set on the thread being profiled
+
+
+@dataclass
+class ProfileResult:
+    name:    str
+    seconds: float = 0.0
+    samples: int = 0
+    paths:   dict = field(default_factory=dict)
+
+
+def thread_settings() -> dict:
+    """Torch and BLAS threading knobs that usually explain CPU-bound latency."""
+    info = {
+        "cpu_count": os.cpu_count(),
+        "env": {k: os.environ.get(k) for k in THREAD_ENV_VARS},
+    }
+    torch = sys.modules.get("torch")  # only report torch if the process already uses it
+    if torch is not None:
+        info["torch"] = {
+            "version":             torch.__version__,
+            "num_threads":         torch.get_num_threads(),
+            "num_interop_threads": torch.get_num_interop_threads(),
+            "mkldnn":              torch.backends.mkldnn.is_available(),
+            "parallel_info":       torch.__config__.parallel_info(),
+        }
+    return info
+
+
+def is_profiling() -> bool:
+    """
+    True inside a profile() block on this thread.  Both the sampler and cProfile
+    only see the profiled thread, so callers that would hand work to a pool
+    should run it inline instead while this is set.
+    """
+    return getattr(_local, "on", False)
+
+
+# ─── Stack sampler ─────────────────────────────────────────────────────────────
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, target_ident: int, interval: float):
+        super().__init__(daemon=True, name="profiling-sampler")
+        self.target_ident = target_ident
+        self.interval     = interval
+        self.counts       = {}
+        self.samples      = 0
+        self._stop_evt    = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.counts.items()):
+                f.write(f"{stack} {n}\n")
+
+
+# ─── Context manager ───────────────────────────────────────────────────────────
+@contextmanager
+def profile(name: str, interval: float = SAMPLE_INTERVAL):
+    """
+    Profile the enclosed block on the current thread and write the results.
+    Raises RuntimeError if another profile is already running.
+    """
+    if not _active.acquire(blocking=False):
+        raise RuntimeError("Another profile is already in progress; try again shortly.")
+    try:
+        with _profile(name, interval) as result:
+            yield result
+    finally:
+        _active.release()
+
+
+@contextmanager
+def _profile(name: str, interval: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp  = time.strftime("%Y%m%d-%H%M%S")
+    stem   = os.path.join(PROFILE_DIR, f"{name}-{stamp}-{os.getpid()}-{next(_seq)}")
+    result = ProfileResult(name)
+
+    sampler  = _StackSampler(threading.get_ident(), interval)
+    profiler = cProfile.Profile()
+    start    = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    _local.on = True
+    try:
+        yield result
+    finally:
+        _local.on = False
+        profiler.disable()
+        sampler.stop()
+        result.seconds = time.perf_counter() - start
+        result.samples = sampler.samples
+
+        result.paths = {"prof": f"{stem}.prof", "folded": f"{stem}.folded", "info": f"{stem}.json"}
+        profiler.dump_stats(result.paths["prof"])
+        sampler.write_folded(result.paths["folded"])
+        with open(result.paths["info"], "w", encoding="utf-8") as f:
+            json.dump({
+                "name":            name,
+                "wall_seconds":    result.seconds,
+                "samples":         result.samples,
+                "sample_interval": interval,
+                "threads":         thread_settings(),
+            }, f, indent=2)
+        print(f"[profiling] {name}: {result.seconds:.3f}s, {result.samples} samples → {stem}.*")
@@ -1,21 +1,87 @@
 #!/usr/bin/env python3
-import json
+import heapq
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 
+from compact_index import CompactIndex
+from metrics import metrics
+from profiling import is_profiling, profile
+from offers import DELTA_FILE, MASTER_FILE, SNAPSHOT_FILE, append_delta, clear_delta, load_offers, pending_delta
+from shards import ShardRouter, ShardStore, list_stores, shard_site, split_shards, write_embedded
+
 # ─── Configuration ─────────────────────────────────────────────────────────────
-OFFERS_PATH     = Path("master_offers2.json")
+OFFERS_PATH     = Path(MASTER_FILE)
+SNAPSHOT_PATH   = Path(SNAPSHOT_FILE)
+DELTA_PATH      = Path(DELTA_FILE)
 EMBED_MODEL     = "all-MiniLM-L6-v2"
 GEN_MODEL       = "google/flan-t5-small"
 CHROMA_DB_DIR   = "./chroma_db"
+VECTOR_STORAGE  = "int8"      # in-memory first-pass copy: "float32", "float16" or "int8"
+ANSWER_CACHE    = 256         # recent answers kept; cleared whenever the index changes
+SHARD_WORKERS   = 4           # parallel shard searches per multi-shard query
+SCRIPT_DIR      = Path(__file__).resolve().parent
+
+# ─── Shard ─────────────────────────────────────────────────────────────────────
+class _Shard:
+    """One shard's store (rows + float32 vectors on disk) plus its compressed first-pass index."""
+
+    def __init__(self, db_dir, name: str):
+        self.db_dir = db_dir
+        self.name   = name
+        self.site   = shard_site(name)
+        self.store  = ShardStore(db_dir, name)
+        self.ids    = set(self.store.ids)
+        self.index  = None
+        if len(self.store):
+            self.index = CompactIndex(self.store.vectors, VECTOR_STORAGE)
+            self.index.load(self.store.ids)
+
+    def refresh(self, changed=()):
+        """
+        Pick up a writer's changes to the store: rows appended since it was
+        opened, plus the rows of `changed` IDs, which were overwritten in place.
+        Returns this shard, or a new one if the store was rebuilt (rows reordered).
+        """
+        store = ShardStore(self.db_dir, self.name)
+        known = len(self.index) if self.index is not None else 0
+        if self.index is None or store.ids[:known] != self.index.ids:
+            return _Shard(self.db_dir, self.name)
+
+        # the store only grew, so swap it in before the index can return new rows
+        self.store, self.index.full = store, store.vectors
+        pos  = {cid: i for i, cid in enumerate(store.ids)}
+        rows = sorted({pos[cid] for cid in changed if pos.get(cid, known) < known} | set(range(known, len(store))))
+        self.index.upsert([store.ids[r] for r in rows], store.vectors.read(rows))
+        self.ids = set(store.ids)
+        return self
+
+    def search(self, q_emb, k: int):
+        """Top-k of this shard as [(score, doc, metadata)], higher score = closer."""
+        if self.index is None:
+            return []
+        hits = self.index.search(q_emb, k)
+        # read after searching: a refresh swaps the (only growing) store in first
+        rows = self.store.rows([row for row, _, _ in hits])
+        return [(score, doc, md) for (_, _, score), (doc, md) in zip(hits, rows)]
+
 
 # ─── LiveRAG Class ─────────────────────────────────────────────────────────────
 class LiveRAG:
-    def __init__(self):
+    def __init__(self, offers_path=OFFERS_PATH, snapshot_path=SNAPSHOT_PATH, db_dir=CHROMA_DB_DIR,
+                 delta_path=DELTA_PATH):
+        self.offers_path   = Path(offers_path)
+        self.snapshot_path = Path(snapshot_path)
+        self.delta_path    = Path(delta_path)
+        self.db_dir        = Path(db_dir)
+
         # 1. Semantic embedder
         self.embedder = SentenceTransformer(EMBED_MODEL, device="cpu")
 
@@ -33,65 +99,132 @@ class LiveRAG:
             early_stopping=True,
         )
 
-        # 3. ChromaDB
-        client = chromadb.PersistentClient(
-            path=CHROMA_DB_DIR,
-            settings=Settings(),
-            tenant=DEFAULT_TENANT,
-            database=DEFAULT_DATABASE,
-        )
-        self.col = client.get_or_create_collection("promo_offers")
+        # 3. One store per site shard.  Chroma keeps every collection it touches
+        #    in memory for good, so only child processes open it: shards.py
+        #    writes stores missing for existing collections, and writes the
+        #    changes apply_delta embeds.
+        self._ingest_lock = threading.Lock()
+        self._run("shards.py", "--db", str(self.db_dir))
+        self.shards = {name: _Shard(self.db_dir, name) for name in list_stores(self.db_dir)}
+        self._shard_pool = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+        self._report_shards()
 
-        # 4. Track ingested IDs
-        self.seen_ids = set()
+        # 4. Routes queries to shards by the sites / brands they mention
+        self.router = ShardRouter()
+        self._learn_routes()
 
         # 5. How many to include in prompt
         self.TOP_K = 3
 
-        # 6. One-time ingest at startup
-        self._update_index()
+        # 6. Answers to recent questions, keyed on the normalised question
+        self._answers    = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # 7. One-time ingest at startup: changes queued by the scraper, plus any
+        #    offers on file that were never embedded
+        self._queue_unindexed()
+        self.apply_delta()
+
+    @property
+    def seen_ids(self) -> set:
+        """IDs (links) already indexed across all shards."""
+        return set().union(*(s.ids for s in self.shards.values()))
+
+    def _report_shards(self):
+        for s in self.shards.values():
+            if s.index is not None and len(s.index):
+                print(
+                    f"[LiveRAG] {s.name}: {len(s.index)} vectors, "
+                    f"{s.index.nbytes / 1024:.1f} KB in memory ({VECTOR_STORAGE}), "
+                    f"{len(s.index) * s.index.dim * 4 / 1024:.1f} KB float32 on disk"
+                )
 
-    def _update_index(self):
-        if not OFFERS_PATH.exists():
+    def _learn_routes(self):
+        for s in self.shards.values():
+            self.router.add_site(s.site)
+        if self.offers_path.exists() or self.snapshot_path.exists():
+            self.router.learn(load_offers(self.offers_path, self.snapshot_path, columns=["site"]))
+
+    def _queue_unindexed(self):
+        """Add offers on file that no shard holds yet to the delta, for apply_delta."""
+        if not self.offers_path.exists() and not self.snapshot_path.exists():
             return
 
-        offers = json.loads(OFFERS_PATH.read_text(encoding="utf-8"))
-        new_ids, docs, metas = [], [], []
-
-        for o in offers:
-            link = o.get("link")
-            if not link or link in self.seen_ids:
-                continue
-            self.seen_ids.add(link)
-            new_ids.append(link)
-            docs.append(f"{o.get('title','')}. {o.get('description','')}")
-            metas.append({
-                "brand":    o.get("brand",""),
-                "expiry":   o.get("expiry",""),
-                "link":     link,
-                "category": o.get("category",""),
-                "discount": str(o.get("discount","")),
-                "image":    o.get("image",""),
-                "channel":  o.get("channel",""),
-            })
-
-        if not new_ids:
+        # Cheap check on the link column alone before loading whole rows
+        seen  = self.seen_ids
+        links = load_offers(self.offers_path, self.snapshot_path, columns=["link"]).column("link")
+        if all(not link or link in seen for link in links):
             return  # nothing new
 
-        print(f"[LiveRAG] Embedding {len(docs)} new offers…")
-        embs = self.embedder.encode(docs, show_progress_bar=False).tolist()
-        self.col.add(
-            ids=new_ids,
-            documents=docs,
-            metadatas=metas,
-            embeddings=embs
-        )
-        print(f"[LiveRAG] Added {len(new_ids)} offers.")
+        offers = load_offers(self.offers_path, self.snapshot_path).with_link().dedup().exclude(seen)
+        if len(offers):
+            print(f"[LiveRAG] {len(offers)} offers on file were never embedded; queueing them")
+            append_delta(offers, self.delta_path, self.offers_path, self.snapshot_path)
+
+    def apply_delta(self, sites=None) -> int:
+        """
+        Embed and upsert the offers the scraper reported as new or changed
+        (only those of `sites`, if given), then drop them from the delta file.
+        Returns how many were applied; the answer cache survives a no-op.
+        """
+        pending = pending_delta(self.delta_path, sites, self.offers_path, self.snapshot_path)
+        offers  = pending.with_link().dedup()
+        if not len(offers):
+            clear_delta(pending, self.delta_path, self.offers_path, self.snapshot_path)
+            return 0
+        print(f"[LiveRAG] Embedding {len(offers)} new or changed offers…")
+        with self._ingest_lock, tempfile.TemporaryDirectory(prefix="liverag-") as tmp:
+            # embed here with the loaded model; a child process only writes these
+            # exact rows to Chroma and the stores, so the shards below re-encode
+            # every row it wrote
+            embedded = Path(tmp) / "offers.arrow"
+            with metrics.timer("ingest_seconds", path="liverag"):
+                with metrics.timer("embed_seconds", path="liverag"):
+                    embs = self.embedder.encode(offers.embed_texts())
+                write_embedded(offers, embs, embedded)
+                self._run("shards.py", "--db", str(self.db_dir), "--upsert", str(embedded))
+            self._refresh_shards(offers)
+        clear_delta(pending, self.delta_path, self.offers_path, self.snapshot_path)
+        self.router.learn(offers)
+        metrics.inc("items_ingested_total", len(offers), path="liverag")
+        self.clear_answer_cache()
+        return len(offers)
+
+    @staticmethod
+    def _run(script: str, *args):
+        subprocess.run([sys.executable, str(SCRIPT_DIR / script), *args], check=True)
+
+    def _refresh_shards(self, offers):
+        """Reopen the stores an ingest run wrote; `offers` are the rows it was asked to apply."""
+        changed = {name: part.column("link") for name, part in split_shards(offers).items()}
+        shards  = dict(self.shards)
+        for name in list_stores(self.db_dir):
+            if name not in shards:
+                shards[name] = _Shard(self.db_dir, name)
+                self.router.add_site(shards[name].site)
+            elif shards[name].store.changed:
+                shards[name] = shards[name].refresh(changed.get(name, ()))
+        # swap in a new dict so concurrent queries never see it resized
+        self.shards = shards
 
     def _retrieve(self, query: str):
-        q_emb = self.embedder.encode(query).tolist()
-        res   = self.col.query(query_embeddings=[q_emb], n_results=self.TOP_K)
-        return list(zip(res["documents"][0], res["metadatas"][0]))
+        with metrics.timer("embed_seconds", path="query"):
+            q_emb = self.embedder.encode(query)
+        with metrics.timer("vector_query_seconds"):
+            return self._search(query, q_emb)
+
+    def _search(self, query: str, q_emb):
+        sites  = self.router.route(query)
+        shards = [s for s in self.shards.values() if not sites or s.site in sites] or list(self.shards.values())
+        metrics.inc("shard_queries_total", len(shards))
+        if len(shards) == 1 or is_profiling():
+            # pool threads are invisible to the profiler; search them here instead
+            hits = [h for s in shards for h in s.search(q_emb, self.TOP_K)]
+        else:
+            # Fan out in parallel; each shard returns its own top-k, merged by score
+            hits = [h for part in self._shard_pool.map(lambda s: s.search(q_emb, self.TOP_K), shards) for h in part]
+        hits = heapq.nlargest(self.TOP_K, hits, key=lambda h: h[0])
+        return [(doc, md) for _, doc, md in hits]
 
     def _build_prompt(self, retrieved, question: str) -> str:
         lines = [
@@ -104,38 +237,107 @@ class LiveRAG:
                 snippet += "…"
             lines.append(f"{i}. {snippet}")
             lines.append(
-                f"   • Brand: {md['brand']}; Discount: {md.get('discount','N/A')}; Expiry: {md.get('expiry','N/A')}"
+                f"   • Brand: {md['brand']}; Discount: {md.get('discount_text') or md.get('discount','N/A')}; Expiry: {md.get('expiry','N/A')}"
             )
         lines.append(f"\nUser asked: {question[:200]}")
         lines.append("Please answer concisely and in a friendly tone, referencing the offers above.")
         return "\n".join(lines)
 
+    @staticmethod
+    def _cache_key(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def is_cached(self, question: str) -> bool:
+        with self._cache_lock:
+            return self._cache_key(question) in self._answers
+
+    def clear_answer_cache(self):
+        with self._cache_lock:
+            self._answers.clear()
+
     def answer(self, question: str) -> str:
+        key = self._cache_key(question)
+        with self._cache_lock:
+            cached = self._answers.get(key)
+            if cached is not None:
+                self._answers.move_to_end(key)
+        if cached is not None:
+            metrics.inc("answer_cache_total", result="hit")
+            return cached
+        metrics.inc("answer_cache_total", result="miss")
+
+        with metrics.timer("answer_seconds"):
+            out = self._answer_uncached(question)
+
+        with self._cache_lock:
+            self._answers[key] = out
+            if len(self._answers) > ANSWER_CACHE:
+                self._answers.popitem(last=False)
+        return out
+
+    def profile_answer(self, question: str):
+        """Answer `question` bypassing the cache, under the profiler → (answer, ProfileResult)."""
+        with profile("answer") as prof:
+            out = self._answer_uncached(question)
+        return out, prof
+
+    def _answer_uncached(self, question: str) -> str:
         retrieved = self._retrieve(question)
         if not retrieved:
             return "Sorry, I couldn't find any relevant offers right now."
-        prompt = self._build_prompt(retrieved, question)
-        out    = self.generator(prompt)[0]["generated_text"]
+        with metrics.timer("prompt_build_seconds"):
+            prompt = self._build_prompt(retrieved, question)
+        with metrics.timer("generate_seconds"):
+            out = self.generator(prompt)[0]["generated_text"]
         return out.strip()
 
 
 # ─── Singleton & module‐level helper ────────────────────────────────────────────
-# Instantiate once and reuse for Slack
-_rag = LiveRAG()
+# Instantiated on first use and reused for Slack, so importing this module
+# (e.g. from the benchmarks) does not load models or open the default DB
+_rag      = None
+_rag_lock = threading.Lock()
+
+def get_rag() -> LiveRAG:
+    global _rag
+    if _rag is None:
+        with _rag_lock:
+            if _rag is None:
+                _rag = LiveRAG()
+    return _rag
 
 def answer_query(question: str) -> str:
     """
     Thin wrapper around our singleton LiveRAG.  
-    Slack app does: `from rag2 import answer_query`
+    Slack app does: `from rag_query import answer_query`
     """
-    return _rag.answer(question)
+    return get_rag().answer(question)
+
+def profile_query(question: str):
+    """Profiled, uncached answer → (answer, ProfileResult)."""
+    return get_rag().profile_answer(question)
 
 
 # ─── CLI Test ───────────────────────────────────────────────────────────
 if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Interactive LiveRAG loop.")
+    ap.add_argument("--profile", action="store_true",
+                    help="profile every query (or prefix a single query with '--profile ')")
+    args = ap.parse_args()
+
+    get_rag()
     print("LiveRAG ready. Type a query or 'exit'.")
     while True:
         q = input("> ").strip()
         if not q or q.lower() in ("exit", "quit"):
             break
-        print("\n" + answer_query(q) + "\n")
+        profiled = args.profile
+        if q.startswith("--profile "):
+            profiled, q = True, q[len("--profile "):].strip()
+        if profiled:
+            out, prof = profile_query(q)
+            print("\n" + out + f"\n(profile: {prof.paths['folded']})\n")
+        else:
+            print("\n" + answer_query(q) + "\n")
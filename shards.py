@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+shards.py
+
+Offers are stored in one Chroma collection per site (optionally per site and
+category) instead of a single `promo_offers` collection:
+
+    promo_offers__nykaa, promo_offers__puma, promo_offers__nykaa__6817, …
+
+Ingestion writes and rebuilds shards independently; `ShardRouter` picks the
+shards a query has to search from the sites it names.
+
+Each shard also has a `ShardStore` next to the Chroma files, holding its rows
+and float32 vectors in plain files.  Chroma loads a collection's whole vector
+segment into memory on first use and never lets go of it, so only ingestion
+opens Chroma; LiveRAG serves queries from the stores, embeds changed offers
+itself and leaves writing them to a child process:
+
+    python shards.py [--db ./chroma_db]                  # (re)write stores missing or out of date
+    python shards.py --db ./chroma_db --upsert rows.arrow   # write pre-embedded offers
+"""
+import json
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from compact_index import VectorFile
+from offers import OfferBatch, site_slug
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+COLLECTION_PREFIX = "promo_offers"
+SHARD_BY_CATEGORY = False     # also split each site by category ID
+STORE_DIR         = "vectors" # per-shard stores, inside the Chroma directory
+EXPORT_BATCH      = 1000      # rows pulled from Chroma per batch when writing a store
+UPSERT_BATCH      = 5000      # stays under Chroma's max batch size
+_SEP              = "__"
+
+
+def open_client(db_path):
+    # imported here so processes that only read stores never load Chroma
+    import chromadb
+    from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+
+    return chromadb.PersistentClient(
+        path=str(db_path),
+        settings=Settings(),
+        tenant=DEFAULT_TENANT,
+        database=DEFAULT_DATABASE,
+    )
+
+
+def shard_name(site: str, category=None) -> str:
+    name = f"{COLLECTION_PREFIX}{_SEP}{site_slug(site)}"
+    if SHARD_BY_CATEGORY and category is not None:
+        name += f"{_SEP}{category}"
+    return name
+
+
+def shard_site(name: str) -> str:
+    """Site slug of a shard collection name."""
+    return name.split(_SEP)[1]
+
+
+def list_shards(client) -> list:
+    """Names of the shard collections present in `client`."""
+    names = [getattr(c, "name", c) for c in client.list_collections()]
+    return sorted(n for n in names if n.startswith(COLLECTION_PREFIX + _SEP))
+
+
+def split_shards(batch: OfferBatch) -> dict:
+    """Partition an OfferBatch column-wise into {shard name: OfferBatch}."""
+    keys = ["site", "category"] if SHARD_BY_CATEGORY else ["site"]
+    groups = batch.table.group_by(keys, use_threads=False).aggregate([]).to_pylist()
+
+    out = {}
+    for g in groups:
+        mask = pc.equal(batch.table.column("site"), g["site"]) if g["site"] is not None \
+            else pc.is_null(batch.table.column("site"))
+        if SHARD_BY_CATEGORY:
+            cat  = batch.table.column("category")
+            mask = pc.and_(mask, pc.equal(cat, g["category"]) if g["category"] is not None else pc.is_null(cat))
+        name = shard_name(g["site"], g.get("category"))
+        part = batch.filter(mask)
+        out[name] = OfferBatch.concat(out[name], part) if name in out else part
+    return out
+
+
+# ─── Store ─────────────────────────────────────────────────────────────────────
+_ROWS_SCHEMA = pa.schema([("id", pa.string()), ("document", pa.string()), ("metadata", pa.string())])
+
+
+def list_stores(db_path) -> list:
+    """Names of the shards that have a store under `db_path`."""
+    root = Path(db_path) / STORE_DIR
+    return sorted(p.name for p in root.iterdir() if (p / "rows.arrow").exists()) if root.is_dir() else []
+
+
+class ShardStore:
+    """
+    One shard's rows outside Chroma: IDs, documents and JSON metadata in
+    `rows.arrow` (memory-mapped, rewritten on every change) and their float32
+    embeddings, row for row, in `vectors.f32`.  `rows.arrow` is written last,
+    so a store interrupted mid-write keeps its previous rows.
+
+    One writer at a time (the ingest process); readers reopen after it ran.
+    """
+
+    def __init__(self, db_path, name: str):
+        self.name    = name
+        self.dir     = Path(db_path) / STORE_DIR / name
+        self.table   = None
+        self.ids     = []
+        self.vectors = None
+        self.opened  = self.version
+        rows = self.dir / "rows.arrow"
+        if rows.exists():
+            self.table = feather.read_table(rows, memory_map=True)
+            self.ids   = self.table.column("id").to_pylist()
+            self._open_vectors(int(self.table.schema.metadata[b"dim"]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def version(self):
+        """Changes whenever a writer replaces rows.arrow."""
+        try:
+            st = os.stat(self.dir / "rows.arrow")
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    @property
+    def changed(self) -> bool:
+        """True once a writer has replaced rows.arrow since this store was opened."""
+        return self.version != self.opened
+
+    def _open_vectors(self, dim: int):
+        self.vectors = VectorFile(self.dir / "vectors.f32", dim)
+
+    def rows(self, positions) -> list:
+        """[(document, metadata)] of the given row numbers."""
+        part = self.table.take(pa.array(positions, pa.int64())).to_pydict()
+        return [(doc, json.loads(md)) for doc, md in zip(part["document"], part["metadata"])]
+
+    def upsert(self, ids, docs, metas, embs):
+        """Overwrite the rows of known IDs in place and append the rest."""
+        if len(ids) == 0:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if self.vectors is None:
+            self._open_vectors(len(embs[0]))
+        if len(self.vectors) > len(self.ids):
+            self.vectors.truncate(len(self.ids))   # rows of an interrupted write
+
+        cols = self.table.to_pydict() if self.table is not None else {f.name: [] for f in _ROWS_SCHEMA}
+        pos  = {cid: i for i, cid in enumerate(self.ids)}
+        rows = []
+        for cid, doc, md in zip(ids, docs, metas):
+            row = pos.get(cid)
+            if row is None:
+                row = pos[cid] = len(cols["id"])
+                cols["id"].append(cid)
+                cols["document"].append(doc)
+                cols["metadata"].append(json.dumps(md))
+            else:
+                cols["document"][row] = doc
+                cols["metadata"][row] = json.dumps(md)
+            rows.append(row)
+        self.vectors.write(rows, embs)
+        self.vectors.sync()
+
+        table = pa.Table.from_pydict(cols, schema=_ROWS_SCHEMA.with_metadata({"dim": str(self.vectors.dim)}))
+        tmp   = self.dir / "rows.arrow.tmp"
+        feather.write_feather(table, tmp, compression="uncompressed")   # so the memory map is zero-copy
+        os.replace(tmp, self.dir / "rows.arrow")
+        self.table  = table
+        self.ids    = cols["id"]
+        self.opened = self.version
+
+    def clear(self):
+        if self.vectors is not None:
+            self.vectors.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.table, self.ids, self.vectors = None, [], None
+
+    def close(self):
+        if self.vectors is not None:
+            self.vectors.close()
+
+
+def export_store(col, store: ShardStore):
+    """Rewrite `store` from a Chroma collection (loads its segment: ingest process only)."""
+    store.clear()
+    total, offset = col.count(), 0
+    while offset < total:
+        got = col.get(include=["embeddings", "documents", "metadatas"], limit=EXPORT_BATCH, offset=offset)
+        if not got["ids"]:
+            break
+        store.upsert(got["ids"], got["documents"], got["metadatas"], got["embeddings"])
+        offset += len(got["ids"])
+
+
+def upsert_shard(col, store, ids, docs, metas, embeddings):
+    """Write embedded rows (`embeddings` a float32 array) to a shard's collection and its store, if any."""
+    for i in range(0, len(ids), UPSERT_BATCH):
+        col.upsert(
+            ids=ids[i:i + UPSERT_BATCH],
+            documents=docs[i:i + UPSERT_BATCH],
+            metadatas=metas[i:i + UPSERT_BATCH],
+            embeddings=embeddings[i:i + UPSERT_BATCH].tolist()
+        )
+    if store is not None:
+        store.upsert(ids, docs, metas, embeddings)
+
+
+def write_embedded(batch: OfferBatch, embeddings, path):
+    """Save deduped offers with their embeddings for `upsert_embedded` in another process."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    column     = pa.FixedSizeListArray.from_arrays(pa.array(embeddings.ravel()), embeddings.shape[1])
+    feather.write_feather(batch.table.append_column("embedding", column), str(path), compression="uncompressed")
+
+
+def upsert_embedded(client, db_path, path) -> dict:
+    """Write the offers saved by `write_embedded` to their shards; returns {shard name: rows}."""
+    counts = {}
+    for name, part in split_shards(OfferBatch(feather.read_table(str(path)))).items():
+        embs  = part.table.column("embedding").combine_chunks()
+        embs  = embs.flatten().to_numpy().reshape(len(part), embs.type.list_size)
+        store = ShardStore(db_path, name)
+        upsert_shard(client.get_or_create_collection(name), store,
+                     part.column("link"), part.embed_texts(), part.metadatas(), embs)
+        store.close()
+        counts[name] = len(part)
+    return counts
+
+
+def sync_stores(client, db_path) -> list:
+    """Export every shard whose store is missing or holds a different row count; returns their names."""
+    synced = []
+    for name in list_shards(client):
+        col   = client.get_collection(name)
+        store = ShardStore(db_path, name)
+        if len(store) != col.count():
+            print(f"Writing vector store for {name} ({col.count()} rows)…")
+            export_store(col, store)
+            synced.append(name)
+        store.close()
+    return synced
+
+
+# ─── Router ────────────────────────────────────────────────────────────────────
+# Brand columns can't be trusted for routing (Flipkart puts "Grab Now" and
+# "Trendy,Glitters & more" there), so beyond site names only these curated
+# brands, each sold by a single site, route a query.
+BRAND_ROUTES = {
+    "kay beauty":      "nykaa",
+    "nykaa cosmetics": "nykaa",
+}
+
+
+def _compile(terms: dict) -> dict:
+    patterns = {}
+    for slug, words in terms.items():
+        alts = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+        patterns[slug] = re.compile(rf"(?<![a-z0-9])(?:{alts})(?![a-z0-9])")
+    return patterns
+
+
+class ShardRouter:
+    """
+    Maps a free-text query to the site slugs it names, by site name or one of
+    BRAND_ROUTES.  Updates build new dicts and swap them in, so `route` can run
+    on other threads while the bot learns new sites.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()           # serialises writers; readers never wait
+        terms = {}
+        for brand, slug in BRAND_ROUTES.items():
+            terms.setdefault(slug, set()).add(brand)
+        self._set_terms(terms)
+
+    def _set_terms(self, terms: dict):
+        self._terms    = terms                  # site slug -> set of lowercase terms
+        self._patterns = _compile(terms)        # site slug -> compiled alternation
+
+    def _with(self, pairs):
+        with self._lock:
+            terms = {slug: set(words) for slug, words in self._terms.items()}
+            for slug, word in pairs:
+                terms.setdefault(slug, set()).add(word)
+            self._set_terms(terms)
+
+    def learn(self, batch: OfferBatch):
+        """Add the site names in an OfferBatch with a site column."""
+        sites = pc.unique(batch.table.column("site")).to_pylist()
+        self._with((site_slug(site), site.lower()) for site in sites if site)
+
+    def add_site(self, slug: str):
+        self._with([(slug, slug.replace("-", " "))])
+
+    def route(self, query: str) -> set:
+        """Site slugs the query is about; empty when it names none (search all)."""
+        q = query.lower()
+        return {slug for slug, pat in self._patterns.items() if pat.search(q)}
+
+
+# ─── CLI: write missing stores or pre-embedded offers ───────────────────────────
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Write the shard stores LiveRAG reads from the Chroma collections.")
+    ap.add_argument("--db", default="./chroma_db")
+    ap.add_argument("--upsert", help="Arrow file of embedded offers (from write_embedded) to write to their shards")
+    args = ap.parse_args()
+    if args.upsert:
+        for name, n in upsert_embedded(open_client(args.db), args.db, args.upsert).items():
+            print(f"Upserted {n} offers into {name}")
+    else:
+        synced = sync_stores(open_client(args.db), args.db)
+        print(f"{len(synced)} store(s) written" if synced else "Stores up to date")
@@ -6,35 +6,62 @@ Slack Bolt app for PromoSensei.  All secrets (Slack + LLM) are inlined.
 """
 import os
 import subprocess
+import sys
 import logging
+import threading
+import time
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 # ─── INLINE CONFIG ───────────────────────────────────────────────────────────────
-# Slack credentials
-SLACK_BOT_TOKEN       = "xoxb..."
-SLACK_APP_TOKEN       = "xapp..."
-SLACK_SIGNING_SECRET  = "6..."
-
-# enable detailed logging
-logging.basicConfig(level=logging.DEBUG)
+# Slack credentials (environment overrides the inline values)
+SLACK_BOT_TOKEN       = os.environ.get("SLACK_BOT_TOKEN", "xoxb...")
+SLACK_APP_TOKEN       = os.environ.get("SLACK_APP_TOKEN", "xapp...")
+SLACK_SIGNING_SECRET  = os.environ.get("SLACK_SIGNING_SECRET", "6...")
+# Set PROMOSENSEI_OFFLINE=1 to build the app without calling Slack's auth.test
+# (used by benchmarks/loadtest.py, which drives the handler locally)
+OFFLINE               = os.environ.get("PROMOSENSEI_OFFLINE") == "1"
+
+# INFO by default; DEBUG formats every payload and slows the command path
+logging.basicConfig(level=os.environ.get("PROMOSENSEI_LOG_LEVEL", "INFO"))
 # If you were using an external LLM API, you could also inline its key here:
 # LLM_API_KEY = "sk-REPLACE_WITH_YOUR_KEY"
 
 # ─── IMPORT YOUR PIPELINE ───────────────────────────────────────────────────────
 # Part 1 & 2
-def run_scraper_and_ingest():
+# One refresh at a time: two concurrent scrapes would each merge into the
+# master file from the same starting point, and the later write would win
+_refresh_lock = threading.Lock()
+
+def run_scraper_and_ingest(site=None):
     # You can call your scripts directly, or import their main()
-    # Here we shell out to keep things simple:
-    subprocess.run(["python", "new_scraper.py"], check=True)
-    subprocess.run(["python", "ingest_offers_chroma3.py"], check=True)
+    # Here we shell out to keep things simple.  With a site, only that
+    # source is re-scraped.  The scraper only passes on new or changed
+    # offers (via the delta file), and LiveRAG has ingest_to_vector_db.py
+    # embed just those, so a refresh where nothing changed costs a few requests.
+    # Returns how many new or changed offers were embedded.
+    sites = None
+    if site:
+        # `site` may be a site ("nykaa") or a source name ("nykaa-offers");
+        # the delta is filtered by the sites those sources write
+        matched = select_sources([site])
+        if not matched:
+            raise ValueError(f"No scraper source or site named `{site}`")
+        sites = sorted({s.site for s in matched})
+    site_args = ["--site", site] if site else []
+    with _refresh_lock:
+        subprocess.run([sys.executable, str(SCRIPT_DIR / "scrapper.py"), *site_args], check=True)
+        return get_rag().apply_delta(sites)
 
 # Part 3
-from rag_query import answer_query
+from rag_query import SCRIPT_DIR, answer_query, get_rag, profile_query
+from metrics import metrics, METRICS_PORT
+from sources import REGISTRY, select_sources
 
 # ─── SET UP SLACK APP ────────────────────────────────────────────────────────────
 app = App(
     token=SLACK_BOT_TOKEN,
-    signing_secret=SLACK_SIGNING_SECRET
+    signing_secret=SLACK_SIGNING_SECRET,
+    token_verification_enabled=not OFFLINE,
 )
 
 # Debug: catch anything that looks like a slash command but didn't match
@@ -42,17 +69,20 @@ app = App(
 def catch_mentions(event, say):
     user = event["user"]
     text = event.get("text", "")
-    logging.debug(f"app_mention received: {event}")
+    logging.debug("app_mention received from %s", user)
     if "/promosensei" in text:
         say(f"<@{user}>, please use `/promosensei` as a slash command, not by mentioning me.")
     else:
         say(f"Hi <@{user}>! Try `/promosensei search [query]` to find deals.")
 
+SUBCOMMANDS = ("search", "summary", "brand", "refresh", "profile")
+
 @app.command("/promosensei")
 def promosensei_handler(ack, respond, command):
     # Acknowledge immediately
+    start = time.perf_counter()
     ack()
-    logging.debug(f"Slash command payload: {command}")
+    metrics.observe("slack_ack_seconds", time.perf_counter() - start)
 
     text = (command.get("text") or "").strip()
     if not text:
@@ -62,7 +92,15 @@ def promosensei_handler(ack, respond, command):
 
     subcmd, *rest = text.split(None, 1)
     arg = rest[0] if rest else ""
+    logging.debug("Slash command: %s", subcmd)
 
+    # keep metric labels bounded whatever users type
+    label = subcmd if subcmd in SUBCOMMANDS else "unknown"
+    metrics.inc("slack_commands_total", subcmd=label)
+    with metrics.timer("slack_command_seconds", subcmd=label):
+        return _dispatch(subcmd, arg, respond, label)
+
+def _dispatch(subcmd, arg, respond, label):
     try:
         if subcmd == "search":
             if not arg:
@@ -80,22 +118,38 @@ def promosensei_handler(ack, respond, command):
             result = answer_query(f"List current offers by brand {arg}")
             return respond(result)
 
+        elif subcmd == "profile":
+            # Hidden: answer like `search`, uncached, and write a profile on the bot host
+            if not arg:
+                return respond("➤ Usage: `/promosensei profile [your query]`")
+            result, prof = profile_query(arg)
+            return respond(f"{result}\n_Profiled in {prof.seconds:.2f}s → `{prof.paths['folded']}`_")
+
         elif subcmd == "refresh":
+            # optional site or source: `/promosensei refresh nykaa` re-scrapes only Nykaa
+            if arg and not select_sources([arg]):
+                return respond(f"❓ Unknown site `{arg}`. Use one of: {', '.join(sorted(REGISTRY))}.")
             respond("🔄 Refreshing data—this may take ~1 minute…")
-            run_scraper_and_ingest()
-            return respond("✅ Done! Promotions have been re-scraped and ingested.")
+            n = run_scraper_and_ingest(arg or None)
+            if not n:
+                return respond("✅ Done! Promotions were re-scraped; nothing new or changed.")
+            return respond(f"✅ Done! Promotions have been re-scraped; {n} new or changed offers ingested.")
 
         else:
             return respond(f"❓ Unknown subcommand `{subcmd}`. Use search, summary, brand, or refresh.")
 
     except subprocess.CalledProcessError as e:
+        metrics.inc("slack_errors_total", subcmd=label)
         logging.error(f"Pipeline error: {e}", exc_info=True)
         return respond(f"❌ Error running pipeline: {e}")
     except Exception as e:
+        metrics.inc("slack_errors_total", subcmd=label)
         logging.error(f"Unexpected error", exc_info=True)
         return respond(f"❌ Unexpected error: {e}")
 
 # ─── START SOCKET MODE ──────────────────────────────────────────────────────────
 if __name__ == "__main__":
+    metrics.start_http_server(int(os.environ.get("PROMOSENSEI_METRICS_PORT", METRICS_PORT)))
+    get_rag()  # load models and index before the first command arrives
     handler = SocketModeHandler(app, SLACK_APP_TOKEN)
     handler.start()
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""
+Pluggable scraper sources.
+
+Each retailer module registers one or more `Source`s: a fetch strategy
+(`ApiPagination`, `DomList` or `NextData`), a mapping from raw items to
+`Offer`, and a rate limit.  `ScrapeEngine` runs any selection of them
+concurrently on one shared browser and HTTP session, fetching
+conditionally against a `FetchState` so only changed offers come back.
+
+To add a retailer, create `sources/<retailer>.py` that calls `register(...)`
+and import it below.
+"""
+from sources.base import (
+    REGISTRY, ApiPagination, DomList, NextData, RateLimit, Source,
+    get_source, register, select_sources,
+)
+from sources.engine import ScrapeEngine
+from sources.state import FETCH_STATE_FILE, UNCHANGED, FetchState
+
+__all__ = [
+    "REGISTRY", "ApiPagination", "DomList", "NextData", "RateLimit", "Source",
+    "get_source", "register", "select_sources",
+    "ScrapeEngine",
+    "FETCH_STATE_FILE", "UNCHANGED", "FetchState",
+    "flipkart", "myntra", "nykaa", "puma",
+]
+
+# Built-in sources register themselves on import
+from sources import flipkart, myntra, nykaa, puma  # noqa: E402
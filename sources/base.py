@@ -0,0 +1,236 @@
+"""
+Building blocks for scraper sources.
+
+A `Source` declares *what* to fetch – a fetch strategy, a field mapping to
+`Offer` and a rate limit – and `ScrapeEngine` (sources/engine.py) supplies the
+shared browser and HTTP session the strategies fetch with.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from offers import Offer, site_slug
+from sources.state import UNCHANGED
+
+# One evaluate() per page instead of a round trip per field per item
+_EXTRACT_JS = """
+([itemSelector, fields]) => Array.from(document.querySelectorAll(itemSelector), item => {
+    const row = {};
+    for (const [key, [selector, attr]] of Object.entries(fields)) {
+        const el = selector ? item.querySelector(selector) : item;
+        row[key] = !el ? "" : attr ? (el.getAttribute(attr) || "") : el.innerText.trim();
+    }
+    return row;
+})
+"""
+
+
+def dig(data, path):
+    """Follow `path` keys through nested dicts; [] if anything is missing."""
+    for key in path:
+        if not isinstance(data, dict):
+            return []
+        data = data.get(key)
+    return data or []
+
+
+async def _unchanged(engine, source, url: str, context_options: dict) -> bool:
+    headers = {"User-Agent": context_options.get("user_agent", "Mozilla/5.0")}
+    if await engine.page_unchanged(source, url, headers):
+        print(f"⏭️ {source.site}: {url} not modified, skipping render")
+        return True
+    return False
+
+
+# ─── Rate limits ───────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class RateLimit:
+    max_concurrency: int = 1      # requests / pages in flight for this source
+    min_interval:    float = 0.0  # seconds between request starts
+
+
+# ─── Fetch strategies ──────────────────────────────────────────────────────────
+# Each strategy's fetch(engine, source) returns [(raw item dict, page URL)].
+
+@dataclass(frozen=True)
+class ApiPagination:
+    """
+    JSON API paged by page number: `{base_url}?{query}` with `{page}` filled in.
+    Fetches `max_concurrency` pages at a time and stops at the first empty page,
+    or after a window ending in `stop_after_unchanged` unchanged pages in a row
+    (0 = never).
+    """
+    base_url:             str
+    query:                str         # e.g. "category_id=11433&page_no={page}"
+    items_path:           tuple       # keys leading to the item list in each response
+    start_page:           int = 1
+    max_pages:            int = 200
+    max_seconds:          float = 30.0
+    stop_after_unchanged: int = 0
+    headers:              dict = field(default_factory=lambda: {"User-Agent": "Mozilla/5.0"})
+
+    def page_url(self, page: int) -> str:
+        return f"{self.base_url}?{self.query.format(page=page)}"
+
+    async def fetch(self, engine, source) -> list:
+        """
+        A failed page fails the whole source (its staged page state is then
+        discarded).  Pages fetched after the last one in a window are never
+        parsed, so their state is unstaged rather than committed.
+        """
+        window = max(1, source.rate_limit.max_concurrency)
+        end    = self.start_page + self.max_pages
+        start  = time.monotonic()
+        items  = []
+        page   = self.start_page
+        streak = 0                 # unchanged pages in a row
+        while page < end and time.monotonic() - start < self.max_seconds:
+            numbers = range(page, min(page + window, end))
+            urls    = [self.page_url(n) for n in numbers]
+            pages   = await asyncio.gather(
+                *(engine.get_json(source, url, self.headers) for url in urls),
+                return_exceptions=True,
+            )
+            for data in pages:
+                if isinstance(data, Exception):
+                    raise data
+
+            # pages already fetched are always consumed; early stopping only
+            # saves the windows after this one
+            for i, (url, data) in enumerate(zip(urls, pages)):
+                if data is UNCHANGED:
+                    # its items are already on file; an unchanged empty page is still the end
+                    streak += 1
+                    last = engine.state.page_items(url) == 0
+                else:
+                    streak = 0
+                    batch  = dig(data, self.items_path)
+                    engine.state.record_items(source.name, url, len(batch))
+                    items += [(raw, url) for raw in batch]
+                    last = not batch
+                if last:
+                    engine.state.unstage(source.name, urls[i + 1:])
+                    return items
+            page += len(urls)
+
+            if self.stop_after_unchanged and streak >= self.stop_after_unchanged:
+                print(f"⏭️ {source.site}: {streak} unchanged pages in a row, stopping after page {page - 1}")
+                return items
+        return items
+
+
+@dataclass(frozen=True)
+class DomList:
+    """
+    Rendered page with one element per item.  `fields` maps an output key to a
+    CSS selector inside the item ("" = the item itself) and an optional
+    attribute; without an attribute the element's inner text is taken.
+    """
+    url:              str
+    item_selector:    str
+    fields:           dict            # key -> (selector, attribute or None)
+    wait_selector:    Optional[str] = None
+    dismiss_selector: Optional[str] = None
+    scroll_steps:     int = 0         # scroll until the item count stops growing
+    scroll_delay_ms:  int = 1000
+    wait_until:       str = "load"
+    timeout_ms:       int = 30000
+    ignore_errors:    tuple = ()      # navigation error substrings to tolerate
+    # Skip rendering when a plain conditional GET says the HTML is unchanged.
+    # Only meaningful when the items are in that HTML, not loaded by scroll/XHR.
+    precheck:         bool = False
+    context_options:  dict = field(default_factory=dict)   # user_agent, locale, …
+
+    async def fetch(self, engine, source) -> list:
+        from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeout
+
+        if self.precheck and await _unchanged(engine, source, self.url, self.context_options):
+            return []
+        async with engine.page(source, self.context_options) as page:
+            try:
+                await page.goto(self.url, wait_until=self.wait_until, timeout=self.timeout_ms)
+            except PlaywrightError as e:
+                if not any(s in str(e) for s in self.ignore_errors):
+                    raise
+
+            if self.dismiss_selector:
+                try:
+                    await page.click(self.dismiss_selector, timeout=2000)
+                except PlaywrightTimeout:
+                    pass
+            if self.wait_selector:
+                await page.wait_for_selector(self.wait_selector, timeout=self.timeout_ms)
+
+            count_js = f"() => document.querySelectorAll({self.item_selector!r}).length"
+            prev = 0
+            for _ in range(self.scroll_steps):
+                curr = await page.evaluate(count_js)
+                if curr == prev:
+                    break
+                prev = curr
+                await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
+                await page.wait_for_timeout(self.scroll_delay_ms)
+
+            rows = await page.evaluate(_EXTRACT_JS, [self.item_selector, self.fields])
+        return [(row, self.url) for row in rows]
+
+
+@dataclass(frozen=True)
+class NextData:
+    """Next.js page whose state sits in `<script id="__NEXT_DATA__">`."""
+    url:             str
+    items_path:      tuple
+    wait_until:      str = "networkidle"
+    timeout_ms:      int = 20000
+    precheck:        bool = True      # __NEXT_DATA__ is in the HTML the pre-check sees
+    context_options: dict = field(default_factory=dict)
+
+    async def fetch(self, engine, source) -> list:
+        if self.precheck and await _unchanged(engine, source, self.url, self.context_options):
+            return []
+        async with engine.page(source, self.context_options) as page:
+            await page.goto(self.url, wait_until=self.wait_until, timeout=self.timeout_ms)
+            # <script> elements are never visible; wait for attachment only
+            await page.wait_for_selector("#__NEXT_DATA__", state="attached", timeout=self.timeout_ms)
+            state = await page.eval_on_selector("#__NEXT_DATA__", "el => JSON.parse(el.textContent)")
+        return [(raw, self.url) for raw in dig(state, self.items_path)]
+
+
+# ─── Source ────────────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class Source:
+    name:       str                                     # registry key, e.g. "nykaa"
+    site:       str                                     # Offer.site / shard, e.g. "Nykaa"
+    strategy:   object                                  # ApiPagination | DomList | NextData
+    map_item:   Callable[[dict, str], Optional[Offer]]  # (raw item, page URL) -> Offer or None
+    rate_limit: RateLimit = RateLimit()
+    enabled:    bool = True
+
+
+REGISTRY = {}
+
+
+def register(source: Source) -> Source:
+    if source.name in REGISTRY:
+        raise ValueError(f"Source {source.name!r} is already registered")
+    REGISTRY[source.name] = source
+    return source
+
+
+def get_source(name: str) -> Source:
+    return REGISTRY[name.lower()]
+
+
+def select_sources(names=None) -> list:
+    """
+    All enabled sources, or those matching `names` by registry name (enabled
+    or not) or by site (enabled only).
+    """
+    if not names:
+        return [s for s in REGISTRY.values() if s.enabled]
+    wanted = {n.lower() for n in names}
+    return [
+        s for s in REGISTRY.values()
+        if s.name in wanted or (s.enabled and site_slug(s.site) in wanted)
+    ]
@@ -0,0 +1,186 @@
+"""
+Shared scrape engine.
+
+One `ScrapeEngine` per scrape run owns a single Chromium (launched on first
+use, one browser context per source) and one pooled `requests.Session`, and
+runs every selected source concurrently under its own rate limit.
+
+Requests are conditional on the `FetchState` passed in (in-memory by
+default), and only offers that are new or changed since that state was
+recorded are returned.
+
+    async with ScrapeEngine(FetchState(FETCH_STATE_FILE)) as engine:
+        offers = await engine.run(select_sources(["nykaa", "puma"]))
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from profiling import is_profiling
+from sources.state import UNCHANGED, FetchState
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+MAX_BROWSER_PAGES = 4       # pages open at once across all sources
+HTTP_POOL_SIZE    = 16      # keep-alive connections per host
+HTTP_TIMEOUT      = 30      # seconds
+
+
+async def _blocking(fn, *args):
+    """Run blocking `fn` in a worker thread, or inline while profiling so it shows up."""
+    if is_profiling():
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+class _Limiter:
+    """Per-source concurrency cap plus a minimum spacing between request starts."""
+
+    def __init__(self, rate_limit):
+        self._slots    = asyncio.Semaphore(max(1, rate_limit.max_concurrency))
+        self._interval = rate_limit.min_interval
+        self._lock     = asyncio.Lock()
+        self._next     = 0.0
+
+    async def __aenter__(self):
+        await self._slots.acquire()
+        if self._interval:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                wait = self._next - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next = loop.time() + self._interval
+
+    async def __aexit__(self, *exc):
+        self._slots.release()
+
+
+class ScrapeEngine:
+    def __init__(self, state: FetchState = None, headless: bool = True, max_pages: int = MAX_BROWSER_PAGES):
+        self.state         = state if state is not None else FetchState()
+        self.headless      = headless
+        self.max_pages     = max_pages
+        self._session      = None
+        self._playwright   = None
+        self._browser      = None
+        self._browser_lock = None
+        self._page_slots   = None
+        self._contexts     = {}    # source name -> BrowserContext
+        self._limiters     = {}    # source name -> _Limiter
+
+    async def __aenter__(self):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._browser_lock = asyncio.Lock()
+        self._page_slots   = asyncio.Semaphore(self.max_pages)
+        return self
+
+    async def __aexit__(self, *exc):
+        for ctx in self._contexts.values():
+            await ctx.close()
+        if self._browser is not None:
+            await self._browser.close()
+            await self._playwright.stop()
+        self._session.close()
+
+    # ── Shared resources ──────────────────────────────────────────────────────
+    def limiter(self, source) -> _Limiter:
+        if source.name not in self._limiters:
+            self._limiters[source.name] = _Limiter(source.rate_limit)
+        return self._limiters[source.name]
+
+    async def _context(self, source, options: dict):
+        # the lock also keeps concurrent first pages from launching twice
+        async with self._browser_lock:
+            if self._browser is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+                self._browser    = await self._playwright.chromium.launch(headless=self.headless)
+            if source.name not in self._contexts:
+                self._contexts[source.name] = await self._browser.new_context(**options)
+        return self._contexts[source.name]
+
+    @asynccontextmanager
+    async def page(self, source, options: dict = None):
+        """A fresh page in the source's browser context, counted against both limits."""
+        async with self.limiter(source), self._page_slots:
+            ctx  = await self._context(source, options or {})
+            page = await ctx.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+
+    def _get(self, url, headers):
+        resp = self._session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        return resp
+
+    async def _conditional_get(self, source, url: str, headers: dict = None):
+        """GET `url` conditionally; returns (response, unchanged?)."""
+        headers = {**(headers or {}), **self.state.request_headers(url)}
+        async with self.limiter(source):
+            resp = await _blocking(self._get, url, headers)
+        unchanged = self.state.page_unchanged(source.name, url, resp)
+        result    = "not_modified" if resp.status_code == 304 else "unchanged" if unchanged else "changed"
+        metrics.inc("fetch_pages_total", site=source.site, result=result)
+        return resp, unchanged
+
+    async def get_json(self, source, url: str, headers: dict = None):
+        """Parsed JSON body of `url`, or UNCHANGED if it has not changed since the last run."""
+        resp, unchanged = await self._conditional_get(source, url, headers)
+        if unchanged:
+            return UNCHANGED
+        return await _blocking(resp.json)
+
+    async def page_unchanged(self, source, url: str, headers: dict = None) -> bool:
+        """
+        Plain-HTTP pre-check before rendering `url` in the browser.  False when
+        the check itself fails (blocked, timeout), so the page is rendered.
+        """
+        try:
+            _, unchanged = await self._conditional_get(source, url, headers)
+        except requests.RequestException:
+            return False
+        return unchanged
+
+    # ── Running sources ───────────────────────────────────────────────────────
+    async def run(self, sources) -> list:
+        """
+        Scrape all `sources` concurrently and return their new or changed
+        offers; a failing source contributes none.
+        """
+        results = await asyncio.gather(*(self.run_source(s) for s in sources))
+        return [offer for offers in results for offer in offers]
+
+    async def run_source(self, source) -> list:
+        with metrics.timer("scrape_seconds", site=source.site):
+            try:
+                raw_items = await source.strategy.fetch(self, source)
+            except Exception as e:
+                self.state.discard(source.name)
+                metrics.inc("scrape_errors_total", site=source.site)
+                print(f"❌ {source.site} ({source.name}): {type(e).__name__}: {e}")
+                return []
+
+        offers = []
+        for raw, page_url in raw_items:
+            offer = source.map_item(raw, page_url)
+            if offer is None:
+                continue
+            offer.site = offer.site or source.site
+            offers.append(offer)
+        changed = self.state.changed_offers(offers)
+        self.state.commit(source.name)
+
+        metrics.inc("items_scraped_total", len(offers), site=source.site)
+        metrics.inc("items_changed_total", len(changed), site=source.site)
+        print(f"✅ {source.site}: scraped {len(offers)} offers, {len(changed)} new or changed ({source.name})")
+        return changed
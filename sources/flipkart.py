@@ -0,0 +1,35 @@
+"""Flipkart: tiles on the offers store, loaded by infinite scroll."""
+from urllib.parse import urljoin
+
+from offers import Offer
+from sources.base import DomList, Source, register
+
+FLIPKART_OFFERS_URL = "https://www.flipkart.com/offers-store"
+
+
+def _map_tile(t: dict, page_url: str) -> Offer:
+    return Offer(
+        title=t["title"],
+        description=t["description"],
+        brand=t["brand"],
+        link=urljoin(page_url, t["href"]),
+    )
+
+
+register(Source(
+    name="flipkart",
+    site="Flipkart",
+    strategy=DomList(
+        url=FLIPKART_OFFERS_URL,
+        item_selector="a._6WQwDJ",
+        fields={
+            "href":        ("", "href"),
+            "title":       ("div._2N1WLe", None),
+            "description": ("div._3LU4EM", None),
+            "brand":       ("div._1xxHXK", None),
+        },
+        dismiss_selector="button._2KpZ6l._2doB4z",   # login pop-up
+        scroll_steps=10,
+    ),
+    map_item=_map_tile,
+))
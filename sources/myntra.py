@@ -0,0 +1,53 @@
+"""Myntra: product cards on the offers listing, loaded by infinite scroll."""
+from urllib.parse import urljoin
+
+from offers import Offer, parse_discount
+from sources.base import DomList, RateLimit, Source, register
+
+MYNTRA_OFFERS_URL = "https://www.myntra.com/offers"
+MYNTRA_UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/113.0.0.0 Safari/537.36"
+)
+
+
+def _map_card(c: dict, page_url: str) -> Offer:
+    name  = " ".join(filter(None, [c["brand"], c["title"]]))
+    price = f"{c['price']} (MRP {c['mrp']})" if c["mrp"] else c["price"]
+    sizes = c["sizes"].replace("\n", " ").strip()
+    return Offer(
+        title=f"{c['discount']} on {name}".strip() if c["discount"] else name,
+        description=" — ".join(filter(None, [name, price, sizes])),
+        brand=c["brand"],
+        link=urljoin(page_url, c["href"]),
+        discount=parse_discount(c["discount"]),
+        discount_text=c["discount"],
+        image=c["image"],
+    )
+
+
+register(Source(
+    name="myntra",
+    site="Myntra",
+    strategy=DomList(
+        url=MYNTRA_OFFERS_URL,
+        item_selector="ul.results-base li.product-base",
+        fields={
+            "href":     ("a", "href"),
+            "image":    ("img.img-responsive", "src"),
+            "brand":    ("h3.product-brand", None),
+            "title":    ("h4.product-product", None),
+            "sizes":    ("h4.product-sizes span", None),
+            "price":    ("span.product-discountedPrice", None),
+            "mrp":      ("span.product-strike", None),
+            "discount": ("span.product-discountPercentage", None),
+        },
+        scroll_steps=10,
+        timeout_ms=45000,
+        ignore_errors=("ERR_HTTP2_PROTOCOL_ERROR",),
+        context_options={"user_agent": MYNTRA_UA, "locale": "en-IN"},
+    ),
+    map_item=_map_card,
+    rate_limit=RateLimit(min_interval=1.0),
+))
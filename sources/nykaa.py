@@ -0,0 +1,72 @@
+"""Nykaa: the product-list API per category, plus the Next.js offers page."""
+from urllib.parse import parse_qs, urlparse
+
+from offers import Offer, parse_category, parse_discount
+from sources.base import ApiPagination, NextData, RateLimit, Source, register
+
+NYKAA_BASE_URL    = "https://www.nykaa.com"
+NYKAA_API_URL     = "https://www.nykaa.com/app-api/index.php/products/list"
+NYKAA_CATEGORY_ID = "11433"   # Kay Beauty: https://www.nykaa.com/brands/kay-beauty/c/11433
+NYKAA_OFFERS_URL  = "https://www.nykaa.com/sp/offers-native/offers"
+
+
+def _map_product(p: dict, page_url: str) -> Offer:
+    name     = p.get("name", "")
+    brand    = p.get("brand", "Nykaa")
+    raw_disc = p.get("discount", "")
+    cat_id   = parse_qs(urlparse(page_url).query).get("category_id", [None])[0]
+    return Offer(
+        title=f"{str(raw_disc).strip()} off on {name}".strip(),
+        description=f"{name} by {brand} — ₹{p.get('final_price', '')} (MRP ₹{p.get('mrp', '')})",
+        expiry=p.get("expiry_date", "Not Mentioned"),
+        brand=brand,
+        link=f"{NYKAA_BASE_URL}{p.get('slug', '')}",
+        discount=parse_discount(raw_disc, bare_percent=True),   # the API reports percent off
+        discount_text=str(raw_disc).strip(),
+        image=p.get("image_url", ""),
+        category=parse_category(cat_id),
+    )
+
+
+def _map_offer(o: dict, page_url: str) -> Offer:
+    name     = (o.get("productName") or "").strip()
+    variant  = (o.get("variantName") or "").strip()
+    raw_disc = (o.get("discountPercent") or "").strip()
+    return Offer(
+        title=f"{raw_disc} off on {name}".strip(),
+        description=f"{' '.join(filter(None, [name, variant]))} — ₹{o.get('salePrice', '')} (MRP ₹{o.get('mrpPrice', '')})",
+        brand="Nykaa",
+        link=f"{NYKAA_BASE_URL}{o.get('productUrl', '')}",
+        discount=parse_discount(raw_disc, bare_percent=True),   # `discountPercent`
+        discount_text=raw_disc,
+        image=o.get("imageUrl", ""),
+    )
+
+
+register(Source(
+    name="nykaa",
+    site="Nykaa",
+    strategy=ApiPagination(
+        base_url=NYKAA_API_URL,
+        query=(f"category_id={NYKAA_CATEGORY_ID}&client=react&filter_format=v2"
+               "&page_no={page}&platform=website&sort=popularity"),
+        items_path=("response", "products"),
+        # popularity order reshuffles pages when anything moves, so a run of
+        # identical pages means the rest is unchanged too (`--full` re-checks)
+        stop_after_unchanged=3,
+    ),
+    map_item=_map_product,
+    rate_limit=RateLimit(max_concurrency=4, min_interval=0.1),
+))
+
+# Off by default; `python scrapper.py --site nykaa-offers` runs it
+register(Source(
+    name="nykaa-offers",
+    site="Nykaa",
+    strategy=NextData(
+        url=NYKAA_OFFERS_URL,
+        items_path=("props", "pageProps", "offerDetailsMetadata", "offersList"),
+    ),
+    map_item=_map_offer,
+    enabled=False,
+))
@@ -0,0 +1,33 @@
+"""PUMA: product grid of a deals / collection page."""
+from urllib.parse import urljoin
+
+from offers import Offer
+from sources.base import DomList, Source, register
+
+PUMA_DEALS_URL = "https://in.puma.com/in/en/motorsport"
+
+
+def _map_item(item: dict, page_url: str) -> Offer:
+    return Offer(
+        title=item["title"],
+        description=item["promo"],
+        brand="PUMA",
+        link=urljoin(page_url, item["href"]) if item["href"] else "",
+    )
+
+
+register(Source(
+    name="puma",
+    site="PUMA",
+    strategy=DomList(
+        url=PUMA_DEALS_URL,
+        item_selector="[data-test-id=product-list-item]",
+        fields={
+            "title": ("h3", None),
+            "promo": ("[data-test-id=promotion-callout-message]", None),
+            "href":  ("a[data-test-id=product-list-item-link]", "href"),
+        },
+        wait_selector="[data-test-id=product-list-item]",
+    ),
+    map_item=_map_item,
+))
@@ -0,0 +1,141 @@
+"""
+Per-URL fetch state for delta scraping.
+
+Kept in FETCH_STATE_FILE between runs:
+
+* pages    – per URL: ETag / Last-Modified for conditional requests, a hash of
+             the last body, how many items the page listed, and when it was
+             last parsed.  Entries older than PAGE_MAX_AGE are not trusted, so
+             every page is re-read in full at least that often.
+* products – per offer link: a fingerprint of the mapped Offer
+
+Page updates are staged per source and only committed once that source has
+finished, so a failed render never marks its page as seen.  The scraper
+saves the file after the master offers are written.
+"""
+import hashlib
+import json
+import os
+import time
+
+from offers import Offer
+
+FETCH_STATE_FILE = "fetch_state.json"
+STATE_VERSION    = 1
+PAGE_MAX_AGE     = 24 * 3600   # seconds before a page is re-read unconditionally
+
+UNCHANGED = object()   # returned instead of a body when a page has not changed
+
+
+def fingerprint(offer: Offer) -> str:
+    payload = json.dumps(offer.to_dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FetchState:
+    def __init__(self, path=None, fresh: bool = False, max_age: float = PAGE_MAX_AGE):
+        """
+        `path=None` keeps the state in memory only; `fresh` ignores what is on
+        disk (a full scrape) and overwrites it on save.
+        """
+        self.path     = path
+        self.max_age  = max_age
+        self.pages    = {}    # url -> {"etag", "last_modified", "hash", "items", "parsed_at"}
+        self.products = {}    # link -> fingerprint
+        self._pending = {}    # source name -> {url: page entry}
+        if path and not fresh and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Ignoring unreadable fetch state {self.path}: {e}")
+            return
+        if data.get("version") != STATE_VERSION:
+            return
+        self.pages    = data.get("pages", {})
+        self.products = data.get("products", {})
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "pages": self.pages, "products": self.products}, f)
+        os.replace(tmp, self.path)
+
+    # ── Pages ─────────────────────────────────────────────────────────────────
+    def _page(self, url: str) -> dict:
+        for staged in self._pending.values():
+            if url in staged:
+                return staged[url]
+        return self.pages.get(url, {})
+
+    def _fresh(self, url: str) -> dict:
+        """The page's entry if it was parsed within `max_age`, else {}."""
+        page = self._page(url)
+        return page if time.time() - page.get("parsed_at", 0) <= self.max_age else {}
+
+    def request_headers(self, url: str) -> dict:
+        """Conditional request headers for `url` from its last response."""
+        page, headers = self._fresh(url), {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def page_unchanged(self, source_name: str, url: str, resp) -> bool:
+        """
+        Stage what `resp` (a requests.Response) says about `url`; True on 304
+        or when the body hashes the same as last time.
+        """
+        old = self._fresh(url)
+        if resp.status_code == 304:
+            self._pending.setdefault(source_name, {})[url] = old
+            return True
+        digest    = hashlib.sha1(resp.content).hexdigest()
+        unchanged = bool(old) and digest == old.get("hash")
+        entry     = {
+            "etag":          resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "hash":          digest,
+            "parsed_at":     old["parsed_at"] if unchanged else time.time(),
+        }
+        if unchanged and "items" in old:
+            entry["items"] = old["items"]
+        self._pending.setdefault(source_name, {})[url] = entry
+        return unchanged
+
+    def page_items(self, url: str):
+        """Items the page listed when last parsed, or None if unknown."""
+        return self._page(url).get("items")
+
+    def record_items(self, source_name: str, url: str, n: int):
+        self._pending.setdefault(source_name, {}).setdefault(url, {})["items"] = n
+
+    def unstage(self, source_name: str, urls):
+        """Forget staged entries for pages that were fetched but not consumed."""
+        staged = self._pending.get(source_name, {})
+        for url in urls:
+            staged.pop(url, None)
+
+    def commit(self, source_name: str):
+        self.pages.update(self._pending.pop(source_name, {}))
+
+    def discard(self, source_name: str):
+        self._pending.pop(source_name, None)
+
+    # ── Products ──────────────────────────────────────────────────────────────
+    def changed_offers(self, offers) -> list:
+        """The offers whose fingerprint differs from the last run (recording the new ones)."""
+        changed = []
+        for offer in offers:
+            fp = fingerprint(offer)
+            if not offer.link or self.products.get(offer.link) != fp:
+                if offer.link:
+                    self.products[offer.link] = fp
+                changed.append(offer)
+        return changed
@@ -0,0 +1,6 @@
+"""
+Focused tests for delta scraping, the delta file, the offer model, the
+shard vector index, the shard router and the metrics registry.
+
+Run from the repo root:  python -m pytest -q tests
+"""
@@ -0,0 +1,126 @@
+"""ApiPagination against a local paged JSON API: early stop, failed pages, staged state."""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from offers import Offer
+from sources import ApiPagination, FetchState, RateLimit, ScrapeEngine, Source
+
+PAGES = 8           # pages with items; page 9 onwards is empty
+PER_PAGE = 3
+
+
+class _Api:
+    def __init__(self):
+        self.pages  = {n: [{"id": f"p{n}-{i}", "v": 0} for i in range(PER_PAGE)] for n in range(1, PAGES + 1)}
+        self.fail   = set()       # pages answered with a 500, once
+        self.served = []          # page numbers requested, in order
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = int(parse_qs(urlparse(self.path).query)["page"][0])
+                api.served.append(page)
+                if page in api.fail:
+                    api.fail.discard(page)
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = json.dumps({"items": api.pages.get(page, [])}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, page: int) -> str:
+        return f"{self.base}?page={page}"
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+
+@pytest.fixture
+def api():
+    api = _Api()
+    yield api
+    api.server.shutdown()
+
+
+def _source(api, stop_after_unchanged=3):
+    strategy = ApiPagination(api.base, "page={page}", ("items",), stop_after_unchanged=stop_after_unchanged)
+    return Source("test-api", "Test", strategy, lambda raw, url: Offer(title=str(raw["v"]), link=raw["id"]),
+                  RateLimit(max_concurrency=4))
+
+
+def _scrape(source, state):
+    async def run():
+        async with ScrapeEngine(state) as engine:
+            return await engine.run([source])
+    return asyncio.run(run())
+
+
+def test_first_run_reads_up_to_the_first_empty_page(api):
+    state = FetchState()
+    assert len(_scrape(_source(api), state)) == PAGES * PER_PAGE
+    assert state.page_items(api.url(PAGES)) == PER_PAGE
+    assert state.page_items(api.url(PAGES + 1)) == 0
+    # fetched in the same window as the empty page but never parsed: not committed
+    assert all(api.url(n) not in state.pages for n in range(PAGES + 2, PAGES + 5))
+
+
+def test_unchanged_run_stops_after_the_first_window(api):
+    source, state = _source(api), FetchState()
+    _scrape(source, state)
+    api.served.clear()
+
+    assert _scrape(source, state) == []
+    assert sorted(api.served) == [1, 2, 3, 4]
+
+
+def test_change_on_a_page_in_the_stopping_window_is_reported(api):
+    source, state = _source(api), FetchState()
+    _scrape(source, state)
+    api.pages[4][0]["v"] = 1
+
+    changed = _scrape(source, state)
+    assert [o.link for o in changed] == ["p4-0"]
+
+
+def test_failed_page_fails_the_source_and_keeps_the_old_state(api):
+    source, state = _source(api), FetchState()
+    _scrape(source, state)
+    before = json.dumps(state.pages, sort_keys=True)
+    api.pages[4][0]["v"] = 1
+    api.fail.add(2)
+
+    assert _scrape(source, state) == []
+    assert json.dumps(state.pages, sort_keys=True) == before
+    assert state._pending == {}
+
+    # nothing was marked as seen, so the next run still reports the change
+    assert [o.link for o in _scrape(source, state)] == ["p4-0"]
+
+
+def test_page_state_expires_after_max_age(api):
+    source = _source(api)
+    state  = FetchState(max_age=-1)
+    _scrape(source, state)
+
+    assert state.request_headers(api.url(1)) == {}
+    api.served.clear()
+    # no page counts as unchanged, so there is no early stop; the products
+    # themselves are unchanged, so nothing is reported
+    assert _scrape(source, state) == []
+    assert set(range(1, PAGES + 2)) <= set(api.served)
@@ -0,0 +1,99 @@
+"""CompactIndex: exact re-ranking, in-place upserts, scale refits and IVF lists."""
+import numpy as np
+import pytest
+
+import compact_index
+from compact_index import CompactIndex, VectorFile
+from shards import ShardStore
+
+DIM  = 16
+NAME = "promo_offers__test"
+
+
+def _vecs(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def _ids(start, stop):
+    return [f"id{i}" for i in range(start, stop)]
+
+
+def _write(store, ids, vecs):
+    store.upsert(ids, [f"doc {cid}" for cid in ids], [{"id": cid} for cid in ids], vecs)
+
+
+def _self_recall(index, vecs):
+    """Share of rows whose own vector finds them first."""
+    return np.mean([index.search(v, 1)[0][0] == row for row, v in enumerate(vecs)])
+
+
+@pytest.mark.parametrize("mode", compact_index.STORAGE_MODES)
+def test_search_reranks_exactly_from_the_vector_file(tmp_path, mode):
+    vecs  = _vecs(300)
+    full  = VectorFile(tmp_path / "v.f32", DIM)
+    full.write(range(300), vecs)
+    index = CompactIndex(full, mode)
+    index.load(_ids(0, 300))
+
+    assert _self_recall(index, vecs) == 1.0
+    (row, cid, score), = index.search(vecs[7], 1)
+    assert (row, cid) == (7, "id7") and score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_upsert_overwrites_in_place(tmp_path):
+    store = ShardStore(tmp_path, NAME)
+    vecs  = _vecs(50)
+    _write(store, _ids(0, 50), vecs)
+    index = CompactIndex(store.vectors)
+    index.load(store.ids)
+
+    moved = -vecs[10:11]
+    _write(store, ["id10"], moved)
+    index.upsert(["id10"], moved)
+
+    assert len(index) == len(store) == len(store.vectors) == 50
+    (row, cid, score), = index.search(moved[0], 1)
+    assert (row, cid) == (10, "id10") and score == pytest.approx(1.0, abs=1e-5)
+    assert store.rows([row]) == [("doc id10", {"id": "id10"})]
+
+
+def test_scales_are_refit_when_a_tiny_first_batch_grows(tmp_path):
+    # one seed row along a single axis: its int8 scales say nothing about
+    # the other dimensions, so later rows would be clipped to zero
+    seed = np.zeros((1, DIM), np.float32)
+    seed[0, 0] = 1.0
+    vecs = np.vstack([seed, _vecs(400)])
+
+    full  = VectorFile(tmp_path / "v.f32", DIM)
+    index = CompactIndex(full, "int8")
+    full.write([0], vecs[:1])
+    index.add(["id0"], vecs[:1])
+    for start in range(1, len(vecs), 10):
+        full.write(range(start, start + 10), vecs[start:start + 10])
+        index.add(_ids(start, start + 10), vecs[start:start + 10])
+
+    assert len(index) / index._fit_rows <= compact_index.REFIT_GROWTH
+    first_pass = [index.candidates(v, 1)[0][0] == row for row, v in enumerate(vecs)]
+    assert np.mean(first_pass) > 0.95
+    assert _self_recall(index, vecs) == 1.0
+
+
+def test_ivf_lists_follow_upserted_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(compact_index, "IVF_MIN_ROWS", 200)
+    centers = _vecs(8, seed=1)
+    labels  = np.random.default_rng(2).integers(0, 8, 600)
+    vecs    = (centers[labels] + 0.3 * _vecs(600, seed=3)).astype(np.float32)
+
+    store = ShardStore(tmp_path, NAME)
+    _write(store, _ids(0, 600), vecs)
+    index = CompactIndex(store.vectors)
+    index.load(store.ids)
+    assert index._state[2] is not None          # centroids fitted
+    assert _self_recall(index, vecs[:100]) > 0.95
+
+    # move a row into another cluster: it must be found there
+    target = vecs[labels != labels[0]][0]
+    _write(store, ["id0"], target[None])
+    index.upsert(["id0"], target[None])
+    assert "id0" in [cid for _, cid, _ in index.search(target, 3)]
+    assert sum(int((lst == 0).sum()) for lst in index._state[3]) == 1
@@ -0,0 +1,99 @@
+"""The changed-offers delta file shared by the scraper, ingest and LiveRAG."""
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from offers import OfferBatch, append_delta, clear_delta, load_offers, pending_delta
+
+
+def _batch(*rows):
+    return OfferBatch.from_dicts({"site": site, "link": link, "title": title} for site, link, title in rows)
+
+
+def test_append_merges_and_keeps_the_newest_row_per_link(tmp_path):
+    path = tmp_path / "changed_offers.json"
+    append_delta(_batch(("Nykaa", "n1", "old"), ("PUMA", "p1", "tee")), path)
+    append_delta(_batch(("Nykaa", "n1", "new")), path)
+
+    pending = pending_delta(path)
+    assert sorted(zip(pending.column("link"), pending.column("title"))) == [("n1", "new"), ("p1", "tee")]
+
+
+def test_pending_filters_by_site_name_or_slug(tmp_path):
+    path = tmp_path / "changed_offers.json"
+    append_delta(_batch(("Nykaa", "n1", "a"), ("PUMA", "p1", "b")), path)
+
+    assert pending_delta(path, ["nykaa"]).column("link") == ["n1"]
+    assert pending_delta(path, ["PUMA"]).column("link") == ["p1"]
+    assert len(pending_delta(tmp_path / "missing.json")) == 0
+
+
+def test_clear_drops_only_the_applied_rows(tmp_path):
+    path = tmp_path / "changed_offers.json"
+    append_delta(_batch(("Nykaa", "n1", "a"), ("PUMA", "p1", "b")), path)
+    applied = pending_delta(path, ["nykaa"])
+    # a scrape finishing while the batch was being embedded
+    append_delta(_batch(("Nykaa", "n2", "c")), path)
+
+    clear_delta(applied, path)
+    assert sorted(pending_delta(path).column("link")) == ["n2", "p1"]
+
+    clear_delta(pending_delta(path), path)
+    assert not path.exists()
+
+
+def test_clear_keeps_a_row_changed_again_since_it_was_read(tmp_path):
+    path = tmp_path / "changed_offers.json"
+    append_delta(_batch(("Nykaa", "n1", "a")), path)
+    applied = pending_delta(path)
+    append_delta(_batch(("Nykaa", "n1", "b")), path)
+
+    clear_delta(applied, path)
+    assert pending_delta(path).column("title") == ["b"]
+
+
+def _append_many(path, prefix, n):
+    for i in range(n):
+        append_delta(_batch(("Nykaa", f"{prefix}{i}", "t")), path)
+
+
+def test_concurrent_appends_keep_every_row(tmp_path):
+    path  = tmp_path / "changed_offers.json"
+    procs = [multiprocessing.Process(target=_append_many, args=(path, p, 15)) for p in "abc"]
+    for p in procs:
+        p.start()
+    threads = [threading.Thread(target=_append_many, args=(path, t, 15)) for t in "de"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for p in procs:
+        p.join()
+
+    assert len(pending_delta(path)) == 75
+
+
+def test_unparseable_files_fall_back_to_the_snapshot(tmp_path):
+    master, snapshot = tmp_path / "master_offers.json", tmp_path / "master_offers.arrow"
+    path = tmp_path / "changed_offers.json"
+    corpus = _batch(("Nykaa", "n1", "a"), ("PUMA", "p1", "b"))
+    corpus.to_json(master)
+    corpus.to_snapshot(snapshot)
+    # a write cut short, newer than the snapshot
+    master.write_text('[{"site": "Nykaa", "li', encoding="utf-8")
+    os.utime(snapshot, (1, 1))
+    assert sorted(load_offers(master, snapshot).column("link")) == ["n1", "p1"]
+
+    # a lost delta file means every offer on file is pending
+    path.write_text('[{"site": "Ny', encoding="utf-8")
+    pending = pending_delta(path, ["puma"], master, snapshot)
+    assert pending.column("link") == ["p1"]
+    clear_delta(pending, path, master, snapshot)
+    assert pending_delta(path).column("link") == ["n1"]
+
+    snapshot.unlink()
+    with pytest.raises(json.JSONDecodeError):
+        load_offers(master, snapshot)
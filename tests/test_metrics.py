@@ -0,0 +1,50 @@
+"""Prometheus text rendering of the shared metrics registry."""
+from metrics import DEFAULT_BUCKETS, Registry
+
+
+def test_counters_render_one_line_per_label_set():
+    reg = Registry()
+    reg.inc("items_scraped_total", 3, site="Nykaa")
+    reg.inc("items_scraped_total", 2, site="Nykaa")
+    reg.inc("items_scraped_total", site="PUMA")
+    reg.inc("answer_cache_total", result="hit")
+
+    lines = reg.render_prometheus().splitlines()
+    assert lines[:2] == ["# TYPE answer_cache_total counter", 'answer_cache_total{result="hit"} 1']
+    assert lines[2] == "# TYPE items_scraped_total counter"
+    assert 'items_scraped_total{site="Nykaa"} 5' in lines
+    assert 'items_scraped_total{site="PUMA"} 1' in lines
+
+
+def test_histograms_render_cumulative_buckets_sum_and_count():
+    reg = Registry()
+    for value in (0.01, 0.2, 0.3, 1000.0):
+        reg.observe("answer_seconds", value, path="query")
+
+    text = reg.render_prometheus()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert lines[0] == "# TYPE answer_seconds histogram"
+    buckets = [line for line in lines if line.startswith("answer_seconds_bucket")]
+    assert len(buckets) == len(DEFAULT_BUCKETS) + 1
+    # a value on a bound counts in that bucket (le is inclusive)
+    assert 'answer_seconds_bucket{path="query",le="0.01"} 1' in buckets
+    assert 'answer_seconds_bucket{path="query",le="0.25"} 2' in buckets
+    assert 'answer_seconds_bucket{path="query",le="120.0"} 3' in buckets
+    assert buckets[-1] == 'answer_seconds_bucket{path="query",le="+Inf"} 4'
+    assert 'answer_seconds_sum{path="query"} 1000.51' in lines
+    assert 'answer_seconds_count{path="query"} 4' in lines
+
+
+def test_unlabelled_series_and_reset():
+    reg = Registry()
+    reg.inc("shard_queries_total", 2)
+    with reg.timer("generate_seconds"):
+        pass
+
+    lines = reg.render_prometheus().splitlines()
+    assert "shard_queries_total 2" in lines
+    assert "generate_seconds_count 1" in lines
+
+    reg.reset()
+    assert reg.render_prometheus() == "\n"
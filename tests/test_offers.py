@@ -0,0 +1,48 @@
+"""Discount parsing and the tolerant `Offer.from_dict` used on scraped JSON."""
+import pytest
+
+from offers import Offer, OfferBatch, parse_discount, site_slug
+
+
+@pytest.mark.parametrize("raw, bare, expected", [
+    ("35% off", False, 35.0),
+    ("Flat 12.5 % OFF", False, 12.5),
+    ("Up to 33.333%", False, 33.33),
+    ("₹200 off", False, None),
+    ("Buy 2 Get 1", False, None),
+    (35, False, None),
+    (35, True, 35.0),
+    ("35", True, 35.0),
+    ("35", False, None),
+    ("₹200", True, None),
+    (True, True, None),
+    ("", True, None),
+    (None, True, None),
+])
+def test_parse_discount(raw, bare, expected):
+    assert parse_discount(raw, bare_percent=bare) == expected
+
+
+def test_from_dict_reads_the_old_all_strings_layout():
+    offer = Offer.from_dict({"site": "Nykaa", "title": "Kajal", "discount": "20", "category": "11433", "brand": None})
+
+    assert offer.discount == 20.0
+    assert offer.discount_text == "20"
+    assert offer.category == 11433
+    assert offer.brand == ""
+
+
+def test_from_dict_keeps_the_retailers_wording_for_non_percentages():
+    offer = Offer.from_dict({"discount": "Buy 2 Get 1", "category": "n/a"})
+    assert offer.discount is None
+    assert offer.discount_text == "Buy 2 Get 1"
+    assert offer.category is None
+
+    offer = Offer.from_dict({"discount": 35.0, "discount_text": "35% off"})
+    assert (offer.discount, offer.discount_text) == (35.0, "35% off")
+
+
+def test_site_slugs_match_site_slug():
+    sites = ["Nykaa", "Tata CLiQ", "", None, "  PUMA India! "]
+    batch = OfferBatch.from_dicts({"site": s} for s in sites)
+    assert batch.site_slugs().to_pylist() == [site_slug(s) for s in sites]
@@ -0,0 +1,101 @@
+"""Shard stores, the embedded-offer hand-off to a writer process, shard refresh and routing."""
+import numpy as np
+import pytest
+
+from offers import OfferBatch
+from shards import ShardRouter, ShardStore, list_stores, shard_name, upsert_embedded, write_embedded
+
+DIM  = 16
+NAME = "promo_offers__test"
+
+
+def _vecs(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def _ids(start, stop):
+    return [f"id{i}" for i in range(start, stop)]
+
+
+def _write(store, ids, vecs):
+    store.upsert(ids, [f"doc {cid}" for cid in ids], [{"id": cid} for cid in ids], vecs)
+
+
+def test_store_round_trip_and_interrupted_write(tmp_path):
+    store = ShardStore(tmp_path, NAME)
+    assert len(store) == 0 and list_stores(tmp_path) == []
+    _write(store, _ids(0, 5), _vecs(5))
+
+    reader = ShardStore(tmp_path, NAME)
+    assert reader.ids == _ids(0, 5) and not reader.changed
+    assert reader.rows([4, 0]) == [("doc id4", {"id": "id4"}), ("doc id0", {"id": "id0"})]
+    assert list_stores(tmp_path) == [NAME]
+
+    # vectors appended by a write that died before rows.arrow was replaced
+    store.vectors.write(range(5, 8), _vecs(3, seed=9))
+    writer = ShardStore(tmp_path, NAME)
+    _write(writer, ["id5"], _vecs(1, seed=4))
+    assert len(writer.vectors) == len(writer) == 6
+    np.testing.assert_array_equal(writer.vectors.read([5]), _vecs(1, seed=4))
+    assert reader.changed
+
+
+def test_embedded_offers_reach_chroma_and_the_stores(tmp_path):
+    pytest.importorskip("chromadb")
+    from shards import open_client
+
+    batch = OfferBatch.from_dicts(
+        {"site": site, "link": link, "title": link, "discount": "10%"}
+        for site, link in [("Nykaa", "n1"), ("PUMA", "p1"), ("Nykaa", "n2")]
+    )
+    vecs = _vecs(3)
+    write_embedded(batch, vecs, tmp_path / "offers.arrow")
+
+    client = open_client(tmp_path / "db")
+    counts = upsert_embedded(client, tmp_path / "db", tmp_path / "offers.arrow")
+    nykaa  = shard_name("Nykaa")
+    assert counts == {nykaa: 2, shard_name("PUMA"): 1}
+
+    store = ShardStore(tmp_path / "db", nykaa)
+    assert store.ids == ["n1", "n2"]
+    np.testing.assert_array_equal(store.vectors.read([0, 1]), vecs[[0, 2]])
+    assert store.rows([1])[0][1]["discount"] == 10.0
+    got = client.get_collection(nykaa).get(ids=["n2"], include=["embeddings"])
+    np.testing.assert_allclose(got["embeddings"][0], vecs[2])
+
+
+def test_shard_refresh_applies_appends_and_in_place_changes(tmp_path):
+    rag_query = pytest.importorskip("rag_query")
+    vecs = _vecs(40)
+    _write(ShardStore(tmp_path, NAME), _ids(0, 30), vecs[:30])
+    shard = rag_query._Shard(tmp_path, NAME)
+
+    # an ingest run: one row changed in place, ten appended
+    writer = ShardStore(tmp_path, NAME)
+    writer.upsert(["id3"], ["changed"], [{"id": "id3"}], -vecs[3:4])
+    _write(writer, _ids(30, 40), vecs[30:])
+    assert shard.store.changed
+
+    refreshed = shard.refresh(["id3"])
+    assert refreshed is shard and len(shard.index) == 40 and "id39" in shard.ids
+    assert shard.search(-vecs[3], 1)[0][1] == "changed"
+    assert shard.search(vecs[35], 1)[0][1] == "doc id35"
+
+    # a rebuild reorders rows: the shard is replaced, not patched
+    ShardStore(tmp_path, NAME).clear()
+    _write(ShardStore(tmp_path, NAME), _ids(0, 40)[::-1], vecs[::-1])
+    rebuilt = shard.refresh()
+    assert rebuilt is not shard and rebuilt.index.ids == _ids(0, 40)[::-1]
+
+
+def test_router_matches_site_names_and_curated_brands_only():
+    router = ShardRouter()
+    router.learn(OfferBatch.from_dicts({"site": s, "brand": "Grab Now"} for s in ["Nykaa", "PUMA", "Tata CLiQ"]))
+    router.add_site("myntra")
+
+    assert router.route("PUMA running tops on offer") == {"puma"}
+    assert router.route("Kay Beauty lipstick, or anything at Tata CLiQ") == {"nykaa", "tata-cliq"}
+    assert router.route("deals on myntra and nykaa") == {"myntra", "nykaa"}
+    # whole words only, and scraped brand columns never route
+    assert router.route("pumas and nykaaland") == set()
+    assert router.route("grab now offers") == set()